@@ -12,9 +12,29 @@ class Settings:
     # Marketdata.app API Token
     MARKETDATA_API_TOKEN: str = os.getenv("MARKETDATA_API_TOKEN")
 
+    # Marketdata.app HTTP client tuning
+    MARKETDATA_POOL_SIZE: int = int(os.getenv("MARKETDATA_POOL_SIZE", 10))
+    MARKETDATA_MAX_CONCURRENCY: int = int(os.getenv("MARKETDATA_MAX_CONCURRENCY", 10))
+    MARKETDATA_TIMEOUT: float = float(os.getenv("MARKETDATA_TIMEOUT", 5.0))
+    MARKETDATA_HTTP2: bool = os.getenv("MARKETDATA_HTTP2", "false").lower() == "true"
+
     # Telegram Bot Configuration
     TELEGRAM_BOT_TOKEN: str = os.getenv("TELEGRAM_BOT_TOKEN")
     TELEGRAM_CHAT_ID: str = os.getenv("TELEGRAM_CHAT_ID")
+    # Outbound pacing, kept under Telegram's per-chat and global bot limits
+    TELEGRAM_CHAT_RATE_PER_MINUTE: float = float(os.getenv("TELEGRAM_CHAT_RATE_PER_MINUTE", 20))
+    TELEGRAM_CHAT_BURST: int = int(os.getenv("TELEGRAM_CHAT_BURST", 3))
+    TELEGRAM_GLOBAL_RATE_PER_SECOND: float = float(os.getenv("TELEGRAM_GLOBAL_RATE_PER_SECOND", 30))
+    TELEGRAM_MAX_RETRIES: int = int(os.getenv("TELEGRAM_MAX_RETRIES", 5))
+    TELEGRAM_TIMEOUT: float = float(os.getenv("TELEGRAM_TIMEOUT", 30.0))
+
+    # Durable Telegram outbox
+    # Seconds before the sender retries after a database error; it doesn't poll while idle
+    OUTBOX_POLL_INTERVAL: float = float(os.getenv("OUTBOX_POLL_INTERVAL", 1.0))
+    OUTBOX_BATCH_SIZE: int = int(os.getenv("OUTBOX_BATCH_SIZE", 20))
+    OUTBOX_MAX_ATTEMPTS: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 5))
+    OUTBOX_RETRY_DELAY: float = float(os.getenv("OUTBOX_RETRY_DELAY", 30.0))
+    OUTBOX_RETENTION_DAYS: float = float(os.getenv("OUTBOX_RETENTION_DAYS", 7))
 
     # Profit Goals (as percentages)
     GOAL_1_PERCENT: float = float(os.getenv("GOAL_1_PERCENT", 30.0))
@@ -26,8 +46,59 @@ class Settings:
     # Stop Loss (as a percentage of entry price)
     STOP_LOSS_PERCENT: float = float(os.getenv("STOP_LOSS_PERCENT", 50.0))
 
+    # Seconds between price polling ticks
+    PRICE_UPDATE_INTERVAL: float = float(os.getenv("PRICE_UPDATE_INTERVAL", 1.0))
+    # Adaptive polling: each trade is polled between the min and max interval depending on how
+    # close its price is to the next goal or the stop loss
+    POLL_MIN_INTERVAL: float = float(os.getenv("POLL_MIN_INTERVAL", 1.0))
+    POLL_MAX_INTERVAL: float = float(os.getenv("POLL_MAX_INTERVAL", 30.0))
+    # Fraction of the expected time to reach a threshold to wait between polls
+    POLL_SAFETY_FACTOR: float = float(os.getenv("POLL_SAFETY_FACTOR", 0.1))
+    # Seconds over which the weight of a volatility sample halves
+    POLL_VOLATILITY_HALF_LIFE: float = float(os.getenv("POLL_VOLATILITY_HALF_LIFE", 120.0))
+    # Option chain requests per second across all trades
+    MARKETDATA_REQUESTS_PER_SECOND: float = float(os.getenv("MARKETDATA_REQUESTS_PER_SECOND", 5.0))
+    # Market calendar: regular session in the exchange's time zone (HH:MM), the close on
+    # early-close days, and comma-separated YYYY-MM-DD dates for unscheduled closures
+    MARKET_TIMEZONE: str = os.getenv("MARKET_TIMEZONE", "America/New_York")
+    MARKET_OPEN_TIME: str = os.getenv("MARKET_OPEN_TIME", "09:30")
+    MARKET_CLOSE_TIME: str = os.getenv("MARKET_CLOSE_TIME", "16:00")
+    MARKET_EARLY_CLOSE_TIME: str = os.getenv("MARKET_EARLY_CLOSE_TIME", "13:00")
+    MARKET_EXTRA_HOLIDAYS: str = os.getenv("MARKET_EXTRA_HOLIDAYS", "")
+    MARKET_EXTRA_EARLY_CLOSES: str = os.getenv("MARKET_EXTRA_EARLY_CLOSES", "")
+
+    # Seconds between write-behind flushes of the in-memory trade book
+    TRADE_BOOK_FLUSH_INTERVAL: float = float(os.getenv("TRADE_BOOK_FLUSH_INTERVAL", 5.0))
+
+    # Maximum number of trades waiting for a peak alert before the price loop waits
+    PEAK_QUEUE_MAXSIZE: int = int(os.getenv("PEAK_QUEUE_MAXSIZE", 100))
+    # Number of peak alerts rendered and sent concurrently (across different trades)
+    PEAK_ALERT_WORKERS: int = int(os.getenv("PEAK_ALERT_WORKERS", 4))
+
+    # Dashboard websockets: frames buffered per client, and how long one send may stall
+    WEBSOCKET_SEND_BUFFER: int = int(os.getenv("WEBSOCKET_SEND_BUFFER", 64))
+    WEBSOCKET_SEND_TIMEOUT: float = float(os.getenv("WEBSOCKET_SEND_TIMEOUT", 5.0))
+    # Buffer overflows in a row after which a client is disconnected instead of resynced
+    WEBSOCKET_MAX_OVERFLOWS: int = int(os.getenv("WEBSOCKET_MAX_OVERFLOWS", 3))
+    # Encode price update batches as arrays unless a client asks for ?encoding=json
+    WEBSOCKET_COMPACT_PRICE_UPDATES: bool = os.getenv("WEBSOCKET_COMPACT_PRICE_UPDATES", "true").lower() == "true"
+    # Recent deltas kept for clients resuming after a reconnect
+    WEBSOCKET_REPLAY_BUFFER: int = int(os.getenv("WEBSOCKET_REPLAY_BUFFER", 1024))
+
+    # Price history retention
+    PRICE_TICK_RETENTION_HOURS: float = float(os.getenv("PRICE_TICK_RETENTION_HOURS", 48))
+    PRICE_BAR_1M_RETENTION_DAYS: float = float(os.getenv("PRICE_BAR_1M_RETENTION_DAYS", 30))
+    PRICE_BAR_1H_RETENTION_DAYS: float = float(os.getenv("PRICE_BAR_1H_RETENTION_DAYS", 730))
+
     # Database URL - defaults to a local file, can be overridden for Docker
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///trades.db")
+    # SQLite performance profile, applied to every new connection
+    SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+    # Negative values are KiB, positive values are pages
+    SQLITE_CACHE_SIZE: int = int(os.getenv("SQLITE_CACHE_SIZE", -64000))
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
 
     # Report Configuration
     BACKGROUND_IMAGE_PATH: str = "app/static/background.jpg"
@@ -35,6 +106,18 @@ class Settings:
 
     # Pyppeteer Configuration
     CHROME_EXECUTABLE_PATH: str = os.getenv("CHROME_EXECUTABLE_PATH") or None
+    # Number of warm pages kept open in the shared browser
+    CHROME_PAGE_POOL_SIZE: int = int(os.getenv("CHROME_PAGE_POOL_SIZE", 2))
+
+    # Backend for standalone SVG alerts: "auto", "cairosvg" or "chrome".
+    # HTML reports are always rendered with Chrome.
+    IMAGE_RENDER_BACKEND: str = os.getenv("IMAGE_RENDER_BACKEND", "auto").lower()
+
+    # Cache of rendered trade alerts; set RENDER_CACHE_DIR to also keep them on disk
+    RENDER_CACHE_SIZE: int = int(os.getenv("RENDER_CACHE_SIZE", 256))
+    RENDER_CACHE_DIR: str = os.getenv("RENDER_CACHE_DIR") or None
+    # Files kept in RENDER_CACHE_DIR; the least recently used are deleted beyond this
+    RENDER_CACHE_DISK_MAX_ENTRIES: int = int(os.getenv("RENDER_CACHE_DISK_MAX_ENTRIES", 2048))
 
 
 # Instantiate settings
@@ -1,7 +1,14 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Enum
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, Date, DateTime, Enum, LargeBinary, ForeignKey, Index, inspect, select, text
+from sqlalchemy.orm import sessionmaker, declarative_base, deferred
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+import asyncio
 import enum
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
 from datetime import datetime
+from typing import Any, AsyncIterator, Callable, List
 
 from .config import settings
 
@@ -14,14 +21,84 @@ class TradeStatus(str, enum.Enum):
     ACTIVE = "Active"
     CLOSED = "Closed"
 
+def _async_database_url(url: str) -> str:
+    """
+    Maps a database URL to the same database through an asyncio driver.
+    """
+    for prefix, async_prefix in (
+        ("sqlite://", "sqlite+aiosqlite://"),
+        ("postgresql://", "postgresql+asyncpg://"),
+        ("postgres://", "postgresql+asyncpg://"),
+    ):
+        if url.startswith(prefix):
+            return async_prefix + url[len(prefix):]
+    return url
+
 # SQLAlchemy setup
+# The sync engine serves startup, migrations and batch jobs running in worker threads;
+# code running on the event loop uses the async engine
 engine = create_engine(settings.DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(_async_database_url(settings.DATABASE_URL))
+# Objects stay usable after commit, e.g. a new trade's id after it is saved
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Applies the SQLite performance profile. In WAL mode readers don't block
+    behind a writer, and synchronous=NORMAL only syncs on checkpoints.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+    cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+    cursor.close()
+
+if engine.dialect.name == "sqlite":
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+
+# All writes made by the app are serialized by this lock, so they never contend for
+# the database's write lock with each other; reads can run concurrently
+_write_lock = asyncio.Lock()
+# Blocking batch writes run on this single thread
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+
+@asynccontextmanager
+async def write_session() -> AsyncIterator[AsyncSession]:
+    """
+    Yields a session for a unit of writes, committed on success and rolled back on error.
+    Holds the write lock for the whole transaction.
+    """
+    async with _write_lock:
+        async with AsyncSessionLocal() as session:
+            try:
+                yield session
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+
+async def run_write(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Runs a blocking function that writes to the database on the writer thread, under the write lock.
+    """
+    async with _write_lock:
+        return await asyncio.get_running_loop().run_in_executor(_writer, functools.partial(fn, *args, **kwargs))
+
 Base = declarative_base()
 
 # ORM Model for the Trades table
 class Trade(Base):
     __tablename__ = "trades"
+    __table_args__ = (
+        # Closed-trade reports filter on status and a closed_at range
+        Index("ix_trades_status_closed_at", "status", "closed_at"),
+        # The active-trade book and per-underlying lookups filter on status first
+        Index("ix_trades_status_underlying", "status", "underlying"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     symbol = Column(String, index=True, comment="The full OCC option symbol")
@@ -35,17 +112,186 @@ class Trade(Base):
     expiration_date = Column(DateTime, comment="The expiration date in ISO format")
     status = Column(Enum(TradeStatus), default=TradeStatus.ACTIVE)
     close_reason = Column(String, nullable=True, comment="Why the trade was closed")
-    entry_image = Column(String, nullable=True, comment="The Base64 string of the initial trade alert image")
-    peak_image = Column(String, nullable=True, comment="The Base64 string of the latest peak price alert image")
+    # Image columns are deferred so that regular trade queries never load the PNG bytes
+    entry_image = deferred(Column(LargeBinary, nullable=True, comment="The PNG bytes of the initial trade alert image"), group="images")
+    peak_image = deferred(Column(LargeBinary, nullable=True, comment="The PNG bytes of the latest peak price alert image"), group="images")
     last_goal_achieved = Column(Integer, default=0, comment="The last profit goal reached (0-5)")
     created_at = Column(DateTime, default=datetime.utcnow)
     closed_at = Column(DateTime, nullable=True)
 
+# Raw price history, one row per observed price change
+class PriceTick(Base):
+    __tablename__ = "price_ticks"
+    __table_args__ = (
+        Index("ix_price_ticks_trade_id_recorded_at", "trade_id", "recorded_at"),
+        Index("ix_price_ticks_recorded_at", "recorded_at"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    trade_id = Column(Integer, ForeignKey("trades.id"), nullable=False, comment="The trade this price belongs to")
+    price = Column(Float, nullable=False, comment="The observed mid price")
+    recorded_at = Column(DateTime, nullable=False, comment="When the price was observed (UTC)")
+
+class BarResolution(str, enum.Enum):
+    MINUTE = "1m"
+    HOUR = "1h"
+
+# Downsampled OHLC bars rolled up from the raw ticks
+class PriceBar(Base):
+    __tablename__ = "price_bars"
+
+    trade_id = Column(Integer, ForeignKey("trades.id"), primary_key=True)
+    resolution = Column(Enum(BarResolution), primary_key=True)
+    start_at = Column(DateTime, primary_key=True, comment="The start of the bar interval (UTC)")
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    tick_count = Column(Integer, nullable=False, comment="Number of raw ticks in the bar")
+
+class OutboxStatus(str, enum.Enum):
+    PENDING = "Pending"
+    SENT = "Sent"
+    FAILED = "Failed"
+
+# Durable queue of outbound Telegram messages
+class OutboxMessage(Base):
+    __tablename__ = "telegram_outbox"
+    __table_args__ = (
+        Index("ix_telegram_outbox_status_priority_id", "status", "priority", "id"),
+        Index("ix_telegram_outbox_ordering_key_status_id", "ordering_key", "status", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    idempotency_key = Column(String, unique=True, nullable=False, comment="Deduplicates repeated enqueues of the same notification")
+    method = Column(String, nullable=False, comment="Telegram Bot API method, e.g. sendPhoto")
+    priority = Column(Integer, nullable=False, comment="Delivery priority, lower is sent first")
+    text = Column(String, nullable=True, comment="Message text or caption")
+    payload = deferred(Column(LargeBinary, nullable=True, comment="Photo or document bytes"))
+    filename = Column(String, nullable=True)
+    ordering_key = Column(String, nullable=True, comment="Pending messages sharing a key are sent one at a time, in id order")
+    status = Column(Enum(OutboxStatus), default=OutboxStatus.PENDING, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(String, nullable=True)
+    next_attempt_at = Column(DateTime, nullable=True, comment="Earliest time of the next delivery attempt")
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+class DailyStats(Base):
+    """
+    Per-day totals of closed trades, maintained incrementally as trades close.
+    Profit and loss are per-share sums, like the trade prices.
+    """
+    __tablename__ = "daily_stats"
+
+    day = Column(Date, primary_key=True, comment="UTC date the trades were closed on")
+    total_trades = Column(Integer, default=0, nullable=False)
+    winning_trades = Column(Integer, default=0, nullable=False)
+    total_profit = Column(Float, default=0.0, nullable=False, comment="Sum of the profits of winning trades")
+    total_loss = Column(Float, default=0.0, nullable=False, comment="Sum of the (non-positive) results of losing trades")
+
+# Columns needed by the price updater and the dashboard; everything else stays in the table
+ACTIVE_TRADE_COLUMNS = (
+    Trade.id,
+    Trade.symbol,
+    Trade.trade_type,
+    Trade.underlying,
+    Trade.strike,
+    Trade.expiration_date,
+    Trade.entry_price,
+    Trade.current_price,
+    Trade.peak_price_today,
+    Trade.last_goal_achieved,
+)
+
+ACTIVE_TRADES_QUERY = select(*ACTIVE_TRADE_COLUMNS).where(Trade.status == TradeStatus.ACTIVE)
+
+def get_active_trades(db) -> List[Row]:
+    """
+    Returns a lightweight, read-only projection of all active trades.
+    The rows expose the same attribute names as `Trade` but are not tracked by the session.
+    """
+    return db.execute(ACTIVE_TRADES_QUERY).all()
+
+async def fetch_active_trades(db: AsyncSession) -> List[Row]:
+    """
+    The async counterpart of `get_active_trades`.
+    """
+    return (await db.execute(ACTIVE_TRADES_QUERY)).all()
+
+def _migrate_image_columns():
+    """
+    Converts images stored by older versions as hex strings into raw bytes.
+    """
+    image_columns = ("entry_image", "peak_image")
+    with engine.begin() as conn:
+        if engine.dialect.name == "sqlite":
+            # SQLite keeps the declared type loosely, so convert the values row by row
+            rows = conn.execute(text(
+                "SELECT id, entry_image, peak_image FROM trades "
+                "WHERE typeof(entry_image) = 'text' OR typeof(peak_image) = 'text'"
+            )).fetchall()
+            for row in rows:
+                values = {}
+                for column, value in zip(image_columns, row[1:]):
+                    try:
+                        values[column] = bytes.fromhex(value) if isinstance(value, str) else value
+                    except ValueError:
+                        values[column] = None
+                conn.execute(
+                    text("UPDATE trades SET entry_image = :entry_image, peak_image = :peak_image WHERE id = :id"),
+                    {"id": row[0], **values}
+                )
+            if rows:
+                print(f"Migrated images of {len(rows)} trades from hex strings to binary.")
+        elif engine.dialect.name == "postgresql":
+            columns = {column["name"]: column["type"] for column in inspect(conn).get_columns("trades")}
+            for column in image_columns:
+                if not isinstance(columns.get(column), LargeBinary):
+                    conn.execute(text(
+                        f"ALTER TABLE trades ALTER COLUMN {column} TYPE BYTEA USING decode({column}, 'hex')"
+                    ))
+                    print(f"Migrated column trades.{column} from hex strings to binary.")
+
+def _add_missing_columns():
+    """
+    Adds nullable columns added to existing tables after they were first created,
+    which `create_all` doesn't do.
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+                print(f"Added column {table.name}.{column.name}.")
+
+def _create_missing_indexes():
+    """
+    Creates indexes added to existing tables after they were first created,
+    which `create_all` doesn't do.
+    """
+    for table in Base.metadata.sorted_tables:
+        # Sorted so the indexes are created in the same order on every run
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            index.create(bind=engine, checkfirst=True)
+
 def init_db():
     """
-    Initializes the database by creating all tables.
+    Initializes the database by creating all tables and migrating existing ones.
     """
+    backfill_daily_stats = not inspect(engine).has_table(DailyStats.__tablename__)
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+    _create_missing_indexes()
+    _migrate_image_columns()
+    if backfill_daily_stats:
+        # The rollup is new: compute it once from the trades closed so far
+        from .services.daily_stats import rebuild_daily_stats
+        print(f"Backfilled daily stats for {rebuild_daily_stats()} days.")
 
 def get_db():
     """
@@ -56,3 +302,10 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """
+    Dependency function to get an async database session for request handlers.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -3,23 +3,30 @@ from fastapi.responses import HTMLResponse, RedirectResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 import asyncio
-import queue
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 from contextlib import asynccontextmanager
-from datetime import datetime
 
 from . import database, auth
 from .workflows import trade_initiator, price_updater, peak_alerter
 from .scheduler import setup_scheduler
 from .websocket import manager
+from .services.marketdata_service import marketdata_service
+from .services.local_image_generator import image_generator
+from .services.trade_book import trade_book
+from .services.coalescing_queue import CoalescingQueue
+from .services.telegram_service import telegram_dispatcher
+from .services.outbox import telegram_outbox
+from .config import settings
 from .workflows.weekly_reporter import run_weekly_report
 from .workflows.monthly_reporter import run_monthly_report
 from .workflows.yearly_reporter import run_yearly_report
 
 
-# Create a shared queue for communication between the producer and consumer
-peak_queue = queue.Queue()
+# Create a shared queue for communication between the producer and consumer.
+# New peaks of the same trade are coalesced while they wait to be rendered.
+peak_queue = CoalescingQueue(maxsize=settings.PEAK_QUEUE_MAXSIZE)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -27,20 +34,27 @@ async def lifespan(app: FastAPI):
     print("Application startup...")
     database.init_db()
     print("Database initialized.")
+    await trade_book.load()
+
+    try:
+        await image_generator.start()
+    except Exception as e:
+        # Renders will retry the launch lazily
+        print(f"Could not start browser pool: {e}")
     
     scheduler = setup_scheduler()
     scheduler.start()
     print("Scheduler started.")
 
-    # Start the background tasks
-    db_session = database.SessionLocal()
-    
     # Start the background tasks and keep a reference to them
     tasks = [
+        asyncio.create_task(trade_book.run_flusher()),
+        asyncio.create_task(telegram_dispatcher.run()),
+        asyncio.create_task(telegram_outbox.run()),
         asyncio.create_task(price_updater.run_price_updater(peak_queue)),
-        asyncio.create_task(peak_alerter.run_peak_alerter(db_session, peak_queue))
+        asyncio.create_task(peak_alerter.run_peak_alerter(peak_queue))
     ]
-    print("Background tasks (price_updater, peak_alerter) started.")
+    print("Background tasks (trade_book, telegram_dispatcher, telegram_outbox, price_updater, peak_alerter) started.")
     
     # # It's better to run one-off tasks like this without blocking startup
     # asyncio.create_task(run_weekly_report())
@@ -60,9 +74,11 @@ async def lifespan(app: FastAPI):
     await asyncio.gather(*tasks, return_exceptions=True)
     print("Background tasks cancelled.")
     
+    await marketdata_service.close()
+    await image_generator.stop()
     scheduler.shutdown()
-    db_session.close()
-    print("Scheduler and DB session closed.")
+    await database.async_engine.dispose()
+    print("Scheduler and database engine closed.")
 
 app = FastAPI(title="Option Trading Bot", lifespan=lifespan)
 
@@ -73,18 +89,17 @@ app.mount("/static", StaticFiles(directory="app/static"), name="static")
 templates = Jinja2Templates(directory="app/templates")
 
 @app.get("/", response_class=HTMLResponse)
-async def read_root(request: Request, db: Session = Depends(database.get_db), user: str = Depends(auth.get_current_user)):
+async def read_root(request: Request, user: str = Depends(auth.get_current_user)):
     """
     Serves the main dashboard, protected by authentication.
+    The active trades table is filled from the websocket snapshot.
     """
-    active_trades = db.query(database.Trade).filter(database.Trade.status == database.TradeStatus.ACTIVE).all()
-    return templates.TemplateResponse("index.html", {"request": request, "trades": active_trades})
+    return templates.TemplateResponse("index.html", {"request": request})
 
 # Endpoint to receive the new trade data from the form
 @app.post("/trade", response_class=HTMLResponse)
 async def create_trade(
     request: Request,
-    db: Session = Depends(database.get_db),
     user: str = Depends(auth.get_current_user),
     trade_type: str = Form(...),
     symbol: str = Form(...),
@@ -108,7 +123,7 @@ async def create_trade(
     }
     
     # Await the result of the workflow to handle success or failure
-    error_message = await trade_initiator.initiate_trade(form_data, db)
+    error_message = await trade_initiator.initiate_trade(form_data)
     
     if error_message:
         return templates.TemplateResponse("trade_error.html", {
@@ -130,31 +145,32 @@ async def websocket_endpoint(websocket: WebSocket):
             # Keep the connection alive
             await websocket.receive_text()
     except WebSocketDisconnect:
+        pass
+    finally:
+        # Also covers clients the manager already evicted
         manager.disconnect(websocket)
 
 @app.post("/trade/{trade_id}/close", response_class=HTMLResponse)
 async def close_trade(
     request: Request,
     trade_id: int,
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_async_db),
     user: str = Depends(auth.get_current_user)
 ):
     """
     Manually closes an active trade.
     """
-    trade = db.query(database.Trade).filter(database.Trade.id == trade_id).first()
+    trade = trade_book.get(trade_id)
     if not trade:
-        raise HTTPException(status_code=404, detail="Trade not found")
-
-    if trade.status == database.TradeStatus.ACTIVE:
-        trade.status = database.TradeStatus.CLOSED
-        trade.exit_price = trade.current_price
-        trade.closed_at = datetime.utcnow()
-        trade.close_reason = f"Manually closed by user {user}"
-        db.commit()
+        # Closed trades are no longer in the book; only unknown ids are an error
+        if await db.scalar(select(database.Trade.id).where(database.Trade.id == trade_id)) is None:
+            raise HTTPException(status_code=404, detail="Trade not found")
+    else:
+        trade_book.close(trade_id, exit_price=trade.current_price, reason=f"Manually closed by user {user}")
+        await trade_book.flush()
 
         # Notify clients to remove the trade from the active table
-        await manager.broadcast({
+        manager.broadcast({
             "type": "trade_closed",
             "trade_id": trade_id
         })
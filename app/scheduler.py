@@ -1,10 +1,34 @@
+from datetime import timedelta
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.base import BaseTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 
 from .workflows.daily_reporter import run_daily_report
 from .workflows.weekly_reporter import run_weekly_report
 from .workflows.monthly_reporter import run_monthly_report
 from .workflows.yearly_reporter import run_yearly_report
+from .workflows.price_rollups import run_price_rollups
+from .services.trading_calendar import TradingCalendar, trading_calendar
+
+class SessionCloseTrigger(BaseTrigger):
+    """
+    Fires `delay` after the close of every trading session, or only of the last
+    session of each "week", "month" or "year". Follows holidays, early closes and DST.
+    """
+    def __init__(self, calendar: TradingCalendar, delay: timedelta, period: str = "day"):
+        self.calendar = calendar
+        self.delay = delay
+        self.period = period
+
+    def get_next_fire_time(self, previous_fire_time, now):
+        start = now if previous_fire_time is None else max(now, previous_fire_time)
+        # Sessions still open at `start - delay`, i.e. that would fire after `start`
+        for session in self.calendar.sessions(start - self.delay):
+            if self.period == "day" or self.calendar.is_last_session_of(session.day, self.period):
+                return session.close + self.delay
+
+    def __str__(self):
+        return f"session close + {self.delay} (every {self.period})"
 
 # Create a scheduler instance
 scheduler = AsyncIOScheduler(timezone="UTC")
@@ -13,41 +37,52 @@ def setup_scheduler():
     """
     Adds the reporting jobs to the scheduler.
     """
-    # Schedule the daily report to run at 22:05 UTC (after market close)
+    # Reports run shortly after the market closes, staggered so they don't render at once
     scheduler.add_job(
         run_daily_report,
-        trigger=CronTrigger(hour=20, minute=35, timezone='UTC'),
+        trigger=SessionCloseTrigger(trading_calendar, timedelta(minutes=35)),
         id="daily_report_job",
         name="Daily Report",
         replace_existing=True,
     )
 
-    # Schedule the weekly report to run on Fridays at 22:10 UTC
+    # The weekly report runs after the last session of the week
     scheduler.add_job(
         run_weekly_report,
-        trigger=CronTrigger(day_of_week="fri", hour=20, minute=40, timezone='UTC'),
+        trigger=SessionCloseTrigger(trading_calendar, timedelta(minutes=40), period="week"),
         id="weekly_report_job",
         name="Weekly Report",
         replace_existing=True,
     )
     
-    # Schedule the monthly report to run on the last Friday of the month at 22:15 UTC
+    # The monthly report runs after the last session of the month
     scheduler.add_job(
         run_monthly_report,
-        trigger=CronTrigger(day_of_week="fri", day="last", hour=20, minute=45, timezone='UTC'),
+        trigger=SessionCloseTrigger(trading_calendar, timedelta(minutes=45), period="month"),
         id="monthly_report_job",
         name="Monthly Report",
         replace_existing=True,
     )
 
-    # Schedule the yearly report to run on the last Friday of December at 22:20 UTC
+    # The yearly report runs after the last session of the year
     scheduler.add_job(
         run_yearly_report,
-        trigger=CronTrigger(month=12, day_of_week="fri", day="last", hour=20, minute=50, timezone='UTC'),
+        trigger=SessionCloseTrigger(trading_calendar, timedelta(minutes=50), period="year"),
         id="yearly_report_job",
         name="Yearly Report",
         replace_existing=True,
     )
 
+    # Roll raw price ticks up into 1-minute and 1-hour bars every minute
+    scheduler.add_job(
+        run_price_rollups,
+        trigger=IntervalTrigger(minutes=1),
+        id="price_rollup_job",
+        name="Price History Rollup",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+    )
+
     print("Scheduler setup complete. Jobs are scheduled.")
     return scheduler
\ No newline at end of file
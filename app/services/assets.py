@@ -0,0 +1,76 @@
+import os
+from typing import Dict, Optional, Tuple
+
+from ..config import settings
+
+# Origin the pooled browser pages load registered assets from; requests to it never leave the process
+ASSET_ORIGIN = "http://assets.local"
+
+class StaticAsset:
+    """
+    A static file loaded into memory.
+    """
+    __slots__ = ("path", "content_type", "mtime", "data")
+
+    def __init__(self, path: str, content_type: str):
+        self.path = path
+        self.content_type = content_type
+        self.mtime: Optional[float] = None
+        self.data: Optional[bytes] = None
+
+    def refresh(self) -> bool:
+        """
+        (Re)loads the file if it changed on disk. Returns whether the asset is available.
+        """
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            if self.data is not None:
+                print(f"Asset {self.path} is no longer available.")
+            self.mtime, self.data = None, None
+            return False
+
+        if mtime != self.mtime:
+            with open(self.path, "rb") as asset_file:
+                self.data = asset_file.read()
+            self.mtime = mtime
+        return True
+
+class AssetRegistry:
+    """
+    Loads static assets used by the report templates once and keeps them in memory,
+    reloading a file only when its modification time changes.
+
+    Templates reference assets by URL (see `url_for`); the browser pool serves those
+    URLs straight from memory, so large images are no longer inlined as base64 into
+    every HTML document.
+    """
+    def __init__(self):
+        self._assets: Dict[str, StaticAsset] = {}
+
+    def register(self, name: str, path: str, content_type: str):
+        self._assets[name] = StaticAsset(path, content_type)
+
+    def _get(self, name: str) -> Optional[StaticAsset]:
+        asset = self._assets.get(name)
+        if asset is None or not asset.refresh():
+            return None
+        return asset
+
+    def url_for(self, name: str) -> str:
+        if name not in self._assets:
+            raise KeyError(f"Unknown asset: {name}")
+        return f"{ASSET_ORIGIN}/{name}"
+
+    def resolve(self, url: str) -> Optional[Tuple[bytes, str]]:
+        """
+        Returns the content and content type for an asset URL, or None if the URL isn't a known asset.
+        """
+        if not url.startswith(ASSET_ORIGIN + "/"):
+            return None
+        asset = self._get(url[len(ASSET_ORIGIN) + 1:])
+        return (asset.data, asset.content_type) if asset else None
+
+# Create a single registry with the assets used by the templates
+asset_registry = AssetRegistry()
+asset_registry.register("background.jpg", settings.BACKGROUND_IMAGE_PATH, "image/jpeg")
@@ -0,0 +1,67 @@
+import asyncio
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Set, Tuple
+
+class CoalescingQueue:
+    """
+    An asyncio queue of keyed events where the latest value wins.
+
+    Putting a key that is already waiting in the queue only replaces its value and keeps
+    its place in line, so a burst of events for the same key is delivered once. Putting a
+    new key waits while the queue is full, which applies backpressure to the producer.
+
+    A key handed out by `get` stays checked out until `task_done` is called for it, so
+    several consumers can work concurrently while events of one key are still handled
+    one at a time and in order.
+    """
+    def __init__(self, maxsize: int = 0):
+        self.maxsize = maxsize
+        self.coalesced = 0
+        self._pending: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._in_flight: Set[Hashable] = set()
+        self._condition = asyncio.Condition()
+
+    def qsize(self) -> int:
+        return len(self._pending)
+
+    def _has_room(self) -> bool:
+        return self.maxsize <= 0 or len(self._pending) < self.maxsize
+
+    async def put(self, key: Hashable, value: Any = None):
+        """
+        Enqueues a value for a key, merging it with an event for that key that is still waiting.
+        """
+        async with self._condition:
+            if key in self._pending:
+                self._pending[key] = value
+                self.coalesced += 1
+                return
+            await self._condition.wait_for(lambda: key in self._pending or self._has_room())
+            self._pending[key] = value
+            self._condition.notify_all()
+
+    def _next_ready(self) -> Optional[Hashable]:
+        for key in self._pending:
+            if key not in self._in_flight:
+                return key
+        return None
+
+    async def get(self) -> Tuple[Hashable, Any]:
+        """
+        Waits for the oldest waiting key that isn't checked out and returns it with its latest value.
+        """
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._next_ready() is not None)
+            key = self._next_ready()
+            value = self._pending.pop(key)
+            self._in_flight.add(key)
+            self._condition.notify_all()
+            return key, value
+
+    async def task_done(self, key: Hashable):
+        """
+        Releases a key returned by `get`, allowing its next event to be handed out.
+        """
+        async with self._condition:
+            self._in_flight.discard(key)
+            self._condition.notify_all()
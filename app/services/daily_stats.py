@@ -0,0 +1,107 @@
+import argparse
+from datetime import date, datetime, time
+from sqlalchemy import case, func, insert
+from typing import Any, Dict, List, Optional
+
+from .. import database
+
+def trade_result(entry_price: float, exit_price: Optional[float]) -> float:
+    """
+    The per-share profit (or loss, if not positive) of a closed trade.
+    """
+    return (exit_price or 0) - entry_price
+
+def _upsert_adding(rows: List[Dict[str, Any]]):
+    """
+    Builds an upsert that adds the given totals to the existing rows of their day.
+    """
+    if database.engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    statement = dialect_insert(database.DailyStats).values(rows)
+    table = database.DailyStats.__table__
+    return statement.on_conflict_do_update(
+        index_elements=["day"],
+        set_={
+            name: table.c[name] + statement.excluded[name]
+            for name in ("total_trades", "winning_trades", "total_profit", "total_loss")
+        }
+    )
+
+async def record_closed_trades(db, closed: List[Dict[str, Any]]):
+    """
+    Adds closed trades, given as {"day", "result"} dicts, to the daily totals.
+    Runs in the caller's transaction so the totals are committed together with the trades.
+    """
+    totals: Dict[date, Dict[str, Any]] = {}
+    for trade in closed:
+        day = totals.setdefault(trade["day"], {
+            "day": trade["day"],
+            "total_trades": 0,
+            "winning_trades": 0,
+            "total_profit": 0.0,
+            "total_loss": 0.0,
+        })
+        day["total_trades"] += 1
+        if trade["result"] > 0:
+            day["winning_trades"] += 1
+            day["total_profit"] += trade["result"]
+        else:
+            day["total_loss"] += trade["result"]
+    if totals:
+        await db.execute(_upsert_adding(list(totals.values())))
+
+def rebuild_daily_stats(since: Optional[date] = None) -> int:
+    """
+    Recomputes the daily totals from the trades table, for all days or from `since` on.
+    Returns the number of days written.
+    """
+    db = database.SessionLocal()
+    try:
+        result = func.coalesce(database.Trade.exit_price, 0) - database.Trade.entry_price
+        is_winner = result > 0
+        closed_day = func.date(database.Trade.closed_at)
+        query = db.query(
+            closed_day,
+            func.count(database.Trade.id),
+            func.sum(case((is_winner, 1), else_=0)),
+            func.sum(case((is_winner, result), else_=0)),
+            func.sum(case((is_winner, 0), else_=result))
+        ).filter(
+            database.Trade.status == database.TradeStatus.CLOSED,
+            database.Trade.closed_at.isnot(None)
+        )
+        stale = db.query(database.DailyStats)
+        if since is not None:
+            query = query.filter(database.Trade.closed_at >= datetime.combine(since, time.min))
+            stale = stale.filter(database.DailyStats.day >= since)
+
+        rows = [
+            {
+                # SQLite's date() returns text
+                "day": date.fromisoformat(day) if isinstance(day, str) else day,
+                "total_trades": total_trades,
+                "winning_trades": winning_trades or 0,
+                "total_profit": total_profit or 0.0,
+                "total_loss": total_loss or 0.0,
+            }
+            for day, total_trades, winning_trades, total_profit, total_loss in query.group_by(closed_day)
+        ]
+        stale.delete(synchronize_session=False)
+        if rows:
+            db.execute(insert(database.DailyStats), rows)
+        db.commit()
+        return len(rows)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the daily_stats rollup from the trades table.")
+    parser.add_argument("--since", type=date.fromisoformat, help="Only rebuild days from this date on (YYYY-MM-DD)")
+    args = parser.parse_args()
+    database.init_db()
+    print(f"Rebuilt daily stats for {rebuild_daily_stats(args.since)} days.")
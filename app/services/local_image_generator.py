@@ -1,90 +1,498 @@
 import asyncio
+import hashlib
+import json
+import os
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import date, datetime
 from pyppeteer import launch
+from pyppeteer.errors import TimeoutError as PageTimeoutError
 from typing import Dict, Any, Optional
 
-from .svg_templates import get_trade_alert_svg, wrap_svg_in_html
+try:
+    import cairosvg
+except (ImportError, OSError):
+    # cairosvg is optional; Chrome is used for everything without it.
+    # Without the system libcairo, importing it raises OSError from cairocffi.
+    cairosvg = None
+
+from .assets import asset_registry, ASSET_ORIGIN
+from .svg_templates import get_trade_alert_svg, wrap_svg_in_html, TRADE_ALERT_TEMPLATE_VERSION
 from ..config import settings
 
+# Rendered documents are loaded from this URL prefix, answered from memory like the assets
+_DOCUMENT_URL_PREFIX = f"{ASSET_ORIGIN}/_documents/"
+
+# How long a render waits for the document's images before capturing anyway
+_PAGE_LOAD_TIMEOUT_MS = 10000
+
+class BrowserPool:
+    """
+    Keeps a single headless browser alive with a pool of warm, reusable pages.
+    The browser is health-checked whenever a page is checked out and relaunched if it has crashed.
+    Requests for registered static assets are answered from memory by the pages themselves.
+    """
+    def __init__(self, pool_size: int):
+        self.pool_size = max(1, pool_size)
+        self._browser = None
+        self._pages: Optional[asyncio.Queue] = None
+        self._generation = 0
+        self._lock = asyncio.Lock()
+        # HTML documents being loaded into pages, by the id in their URL
+        self._documents: Dict[str, str] = {}
+
+    async def start(self):
+        """
+        Launches the browser and opens the page pool.
+        """
+        async with self._lock:
+            if self._browser is None:
+                await self._launch()
+
+    async def stop(self):
+        """
+        Closes the browser and discards the page pool.
+        """
+        async with self._lock:
+            await self._close_browser()
+
+    async def _launch(self):
+        launch_options = {
+            'headless': True,
+            'args': ['--no-sandbox', '--disable-setuid-sandbox'],
+            # Signal handling is left to uvicorn
+            'handleSIGINT': False,
+            'handleSIGTERM': False,
+            'handleSIGHUP': False,
+        }
+        if settings.CHROME_EXECUTABLE_PATH:
+            launch_options['executablePath'] = settings.CHROME_EXECUTABLE_PATH
+
+        self._browser = await launch(**launch_options)
+        self._generation += 1
+        self._pages = asyncio.Queue()
+        for _ in range(self.pool_size):
+            self._pages.put_nowait(await self._new_page())
+        print(f"Browser pool started with {self.pool_size} pages.")
+
+    async def _new_page(self):
+        """
+        Opens a page that serves asset URLs from the asset registry.
+        """
+        page = await self._browser.newPage()
+        await page.setRequestInterception(True)
+        page.on('request', lambda request: asyncio.ensure_future(self._handle_request(request)))
+        return page
+
+    async def _handle_request(self, request):
+        try:
+            if request.url.startswith(_DOCUMENT_URL_PREFIX):
+                html_content = self._documents.get(request.url[len(_DOCUMENT_URL_PREFIX):])
+                if html_content is None:
+                    await request.respond({'status': 404, 'body': ''})
+                else:
+                    await request.respond({
+                        'status': 200,
+                        'contentType': 'text/html; charset=utf-8',
+                        'body': html_content.encode('utf-8')
+                    })
+                return
+            asset = asset_registry.resolve(request.url)
+            if asset is not None:
+                data, content_type = asset
+                await request.respond({'status': 200, 'contentType': content_type, 'body': data})
+            elif request.url.startswith(ASSET_ORIGIN):
+                await request.respond({'status': 404, 'body': ''})
+            else:
+                await request.continue_()
+        except Exception as e:
+            print(f"Error serving browser request {request.url}: {e}")
+
+    async def load_content(self, page, html_content: str):
+        """
+        Loads HTML into a page and waits for its load event, i.e. until every image,
+        including SVG <image> elements, has loaded or failed. Unlike `page.setContent`,
+        which returns as soon as the markup is written.
+        """
+        document_id = uuid.uuid4().hex
+        self._documents[document_id] = html_content
+        try:
+            await page.goto(f"{_DOCUMENT_URL_PREFIX}{document_id}", {
+                'waitUntil': 'load',
+                'timeout': _PAGE_LOAD_TIMEOUT_MS
+            })
+        except PageTimeoutError:
+            print("Timed out waiting for page images to load. Capturing anyway.")
+        finally:
+            self._documents.pop(document_id, None)
+
+    async def _close_browser(self):
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception as e:
+                print(f"Error closing pooled browser: {e}")
+        if self._pages is not None:
+            # Wake up anyone still waiting on the old pool so they retry on the new browser
+            for _ in range(self.pool_size):
+                self._pages.put_nowait(None)
+        self._browser = None
+        self._pages = None
+
+    def _is_healthy(self) -> bool:
+        """
+        Checks that the browser process is still running.
+        """
+        if self._browser is None:
+            return False
+        process = getattr(self._browser, 'process', None)
+        return process is None or process.poll() is None
+
+    async def _ensure_browser(self):
+        """
+        Launches the browser on first use and relaunches it if it has crashed.
+        """
+        if self._is_healthy():
+            return
+        async with self._lock:
+            if self._is_healthy():
+                return
+            if self._browser is not None:
+                print("Pooled browser is not running. Relaunching...")
+                await self._close_browser()
+            await self._launch()
+
+    async def restart(self):
+        """
+        Forces a relaunch of the browser, e.g. after a render failed mid-flight.
+        """
+        async with self._lock:
+            await self._close_browser()
+            await self._launch()
+
+    @asynccontextmanager
+    async def page(self):
+        """
+        Checks out a warm page for the duration of the block.
+        Pages that fail during use are replaced rather than returned to the pool.
+        """
+        page = None
+        while page is None:
+            await self._ensure_browser()
+            generation = self._generation
+            pages = self._pages
+            page = await pages.get()
+        healthy = False
+        try:
+            yield page
+            healthy = True
+        finally:
+            # Pages from a browser that was relaunched meanwhile are simply dropped
+            if generation == self._generation:
+                if healthy and not page.isClosed():
+                    pages.put_nowait(page)
+                else:
+                    asyncio.ensure_future(self._replace_page(page, pages, generation))
+
+    async def _replace_page(self, page, pages: asyncio.Queue, generation: int):
+        try:
+            if not page.isClosed():
+                await page.close()
+        except Exception:
+            pass
+        try:
+            if generation == self._generation and self._is_healthy():
+                pages.put_nowait(await self._new_page())
+                return
+        except Exception as e:
+            print(f"Error replacing pooled page: {e}")
+        # Opening a page failed, so the browser itself is most likely gone
+        if generation == self._generation:
+            try:
+                await self.restart()
+            except Exception as e:
+                print(f"Error relaunching pooled browser: {e}")
+
+class RenderCache:
+    """
+    A bounded LRU cache of rendered images, optionally backed by a directory on disk.
+    The directory keeps at most `disk_max_entries` files, the least recently used are
+    pruned first. File I/O runs in a worker thread, off the event loop.
+    """
+    def __init__(self, max_entries: int, directory: Optional[str] = None, disk_max_entries: int = 0, log_every: int = 100):
+        self.max_entries = max_entries
+        self.directory = directory
+        self.disk_max_entries = disk_max_entries
+        self.log_every = log_every
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def _normalize(value: Any) -> Any:
+        """
+        Reduces a template input to the precision it is displayed with.
+        """
+        if isinstance(value, float):
+            return f"{value:.2f}"
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        return value
+
+    def make_key(self, namespace: str, data: Dict[str, Any]) -> str:
+        normalized = {name: self._normalize(value) for name, value in data.items()}
+        payload = json.dumps([namespace, normalized], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.png")
+
+    def _read_file(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as image_file:
+                image_bytes = image_file.read()
+            # Mark the file as recently used for pruning
+            os.utime(path)
+            return image_bytes
+        except FileNotFoundError:
+            return None
+
+    def _write_file(self, key: str, image_bytes: bytes):
+        # Write under a temporary name so readers never see a partial file
+        temporary_path = f"{self._path(key)}.tmp"
+        with open(temporary_path, "wb") as image_file:
+            image_file.write(image_bytes)
+        os.replace(temporary_path, self._path(key))
+        self._prune_directory()
+
+    def _prune_directory(self):
+        """
+        Deletes the least recently used files beyond `disk_max_entries`.
+        """
+        if self.disk_max_entries <= 0:
+            return
+        with os.scandir(self.directory) as entries:
+            files = [entry for entry in entries if entry.name.endswith(".png")]
+        if len(files) <= self.disk_max_entries:
+            return
+        files.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in files[:len(files) - self.disk_max_entries]:
+            try:
+                os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    async def get(self, key: str) -> Optional[bytes]:
+        image_bytes = self._entries.get(key)
+        if image_bytes is not None:
+            self._entries.move_to_end(key)
+        elif self.directory:
+            try:
+                image_bytes = await asyncio.to_thread(self._read_file, key)
+            except OSError as e:
+                print(f"Error reading render cache entry: {e}")
+            if image_bytes is not None:
+                self.disk_hits += 1
+                if self.max_entries > 0:
+                    self._remember(key, image_bytes)
+
+        if image_bytes is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        if self.log_every > 0 and (self.hits + self.misses) % self.log_every == 0:
+            print(f"Render cache stats: {self.stats()}")
+        return image_bytes
+
+    def _remember(self, key: str, image_bytes: bytes):
+        self._entries[key] = image_bytes
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def put(self, key: str, image_bytes: bytes):
+        if self.max_entries > 0:
+            self._remember(key, image_bytes)
+        if self.directory:
+            try:
+                await asyncio.to_thread(self._write_file, key, image_bytes)
+            except OSError as e:
+                print(f"Error writing render cache entry: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses, "entries": len(self._entries)}
+
+class SvgRenderBackend(ABC):
+    """
+    Base class for backends that rasterize a self-contained SVG document to PNG.
+    """
+    name = "base"
+
+    @abstractmethod
+    async def render_svg(self, svg_content: str, width: int, height: int) -> Optional[bytes]:
+        """
+        Returns the PNG bytes, or None if rendering failed.
+        """
+
+class CairoSvgBackend(SvgRenderBackend):
+    """
+    Rasterizes SVG in-process with cairosvg, without starting a browser.
+    """
+    name = "cairosvg"
+
+    def __init__(self):
+        if cairosvg is None:
+            raise RuntimeError("cairosvg is not installed.")
+
+    async def render_svg(self, svg_content: str, width: int, height: int) -> Optional[bytes]:
+        try:
+            # Rasterizing is CPU-bound, so keep it off the event loop
+            return await asyncio.to_thread(
+                cairosvg.svg2png,
+                bytestring=svg_content.strip().encode("utf-8"),
+                output_width=width,
+                output_height=height
+            )
+        except Exception as e:
+            print(f"Error rendering SVG with cairosvg: {e}")
+            return None
+
+class ChromeSvgBackend(SvgRenderBackend):
+    """
+    Rasterizes SVG by screenshotting it in a pooled headless browser page.
+    """
+    name = "chrome"
+
+    def __init__(self, generator: "LocalImageGenerator"):
+        self.generator = generator
+
+    async def render_svg(self, svg_content: str, width: int, height: int) -> Optional[bytes]:
+        html_content = wrap_svg_in_html(svg_content)
+        return await self.generator.generate_image(html_content, {'width': width, 'height': height})
+
 class LocalImageGenerator:
     """
     Generates PNG images and PDFs from HTML/SVG content using a local headless browser.
+    Standalone SVG templates can be rasterized by a lighter backend, with the browser as fallback.
     """
+    def __init__(self, browser_pool: BrowserPool, svg_backend: str = "auto", render_cache: Optional[RenderCache] = None):
+        self.browser_pool = browser_pool
+        self.render_cache = render_cache
+        self.chrome_backend = ChromeSvgBackend(self)
+        self.svg_backend = self._select_svg_backend(svg_backend)
+        print(f"Using '{self.svg_backend.name}' backend for SVG rendering.")
+
+    def _select_svg_backend(self, name: str) -> SvgRenderBackend:
+        """
+        Picks the SVG backend by name. 'auto' prefers cairosvg when it is installed.
+        """
+        if name == "chrome":
+            return self.chrome_backend
+        if name == "cairosvg" or (name == "auto" and cairosvg is not None):
+            return CairoSvgBackend()
+        if name != "auto":
+            raise ValueError(f"Unknown image render backend: {name}")
+        return self.chrome_backend
+
+    async def start(self):
+        """
+        Warms up the browser pool.
+        """
+        await self.browser_pool.start()
+
+    async def stop(self):
+        """
+        Shuts down the browser pool.
+        """
+        await self.browser_pool.stop()
+
     async def generate_image(self, html_content: str, viewport: Dict[str, int]) -> Optional[bytes]:
         """
         Renders HTML content to a PNG image.
         """
-        browser = None
         try:
-            launch_options = {
-                'headless': True,
-                'args': ['--no-sandbox', '--disable-setuid-sandbox']
-            }
-            if settings.CHROME_EXECUTABLE_PATH:
-                launch_options['executablePath'] = settings.CHROME_EXECUTABLE_PATH
-            
-            browser = await launch(**launch_options)
-            page = await browser.newPage()
-            await page.setViewport(viewport)
-            await page.setContent(html_content)
-            
-            await asyncio.sleep(0.1)
-
-            screenshot = await page.screenshot({
-                'type': 'png',
-                'omitBackground': True,
-            })
-            return screenshot
+            async with self.browser_pool.page() as page:
+                await page.setViewport(viewport)
+                await self.browser_pool.load_content(page, html_content)
+
+                # Make sure web fonts are ready before taking the screenshot
+                await page.evaluate('() => document.fonts.ready.then(() => true)')
+
+                screenshot = await page.screenshot({
+                    'type': 'png',
+                    'omitBackground': True,
+                })
+                return screenshot
         except Exception as e:
             print(f"Error generating image with pyppeteer: {e}")
             return None
-        finally:
-            if browser:
-                await browser.close()
+
+    async def render_svg(self, svg_content: str, width: int, height: int) -> Optional[bytes]:
+        """
+        Renders a standalone SVG to PNG with the configured backend,
+        falling back to the browser if that backend fails.
+        """
+        image_bytes = await self.svg_backend.render_svg(svg_content, width, height)
+        if image_bytes is None and self.svg_backend is not self.chrome_backend:
+            print(f"SVG backend '{self.svg_backend.name}' failed. Falling back to Chrome.")
+            image_bytes = await self.chrome_backend.render_svg(svg_content, width, height)
+        return image_bytes
 
     async def generate_trade_alert(self, trade_data: Dict[str, Any]) -> Optional[bytes]:
         """
         Generates a standard trade alert image.
+        Identical visual inputs are served from the render cache.
         """
+        cache_key = None
+        if self.render_cache is not None:
+            cache_key = self.render_cache.make_key(f"trade_alert:v{TRADE_ALERT_TEMPLATE_VERSION}", trade_data)
+            cached = await self.render_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
         svg_content = get_trade_alert_svg(trade_data)
-        html_content = wrap_svg_in_html(svg_content)
-        viewport = {'width': 632, 'height': 216}
-        return await self.generate_image(html_content, viewport)
+        image_bytes = await self.render_svg(svg_content, 632, 216)
+        if image_bytes is not None and cache_key is not None:
+            await self.render_cache.put(cache_key, image_bytes)
+        return image_bytes
 
     async def generate_pdf(self, html_content: str) -> Optional[bytes]:
         """
         Renders HTML content to a PDF document.
         """
-        browser = None
         try:
-            launch_options = {
-                'headless': True,
-                'args': ['--no-sandbox', '--disable-setuid-sandbox']
-            }
-            if settings.CHROME_EXECUTABLE_PATH:
-                launch_options['executablePath'] = settings.CHROME_EXECUTABLE_PATH
-            
-            browser = await launch(**launch_options)
-            page = await browser.newPage()
-            await page.setContent(html_content)
-            
-            pdf_data = await page.pdf({
-                'printBackground': True,
-                'width': '830px', # Set width to match template
-                # Omitting height allows it to grow based on content
-                'margin': {
-                    'top': '0px',
-                    'right': '0px',
-                    'bottom': '0px',
-                    'left': '0px'
-                }
-            })
-            return pdf_data
+            async with self.browser_pool.page() as page:
+                await self.browser_pool.load_content(page, html_content)
+
+                pdf_data = await page.pdf({
+                    'printBackground': True,
+                    'width': '830px', # Set width to match template
+                    # Omitting height allows it to grow based on content
+                    'margin': {
+                        'top': '0px',
+                        'right': '0px',
+                        'bottom': '0px',
+                        'left': '0px'
+                    }
+                })
+                return pdf_data
         except Exception as e:
             print(f"Error generating PDF with pyppeteer: {e}")
             return None
-        finally:
-            if browser:
-                await browser.close()
 
 # Create a single instance of the service
-image_generator = LocalImageGenerator()
\ No newline at end of file
+image_generator = LocalImageGenerator(
+    BrowserPool(pool_size=settings.CHROME_PAGE_POOL_SIZE),
+    svg_backend=settings.IMAGE_RENDER_BACKEND,
+    render_cache=RenderCache(
+        max_entries=settings.RENDER_CACHE_SIZE,
+        directory=settings.RENDER_CACHE_DIR,
+        disk_max_entries=settings.RENDER_CACHE_DISK_MAX_ENTRIES
+    )
+)
@@ -1,49 +1,89 @@
-import requests
-from typing import Optional, Dict, Any
+import asyncio
+import httpx
+from typing import Optional, Dict, Any, Iterable
 
 from ..config import settings
 
 class MarketDataService:
     """
     A service to interact with the Marketdata.app API.
+
+    All requests share one pooled, keep-alive HTTP client so a tick of many quotes
+    reuses a handful of connections instead of opening one per request.
     """
     BASE_URL = "https://api.marketdata.app/v1/"
 
-    def __init__(self, api_token: str):
+    def __init__(
+        self,
+        api_token: str,
+        pool_size: int = 10,
+        max_concurrency: int = 10,
+        timeout: float = 5.0,
+        http2: bool = False
+    ):
         if not api_token:
             raise ValueError("Marketdata API token is required.")
         self.api_token = api_token
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.http2 = http2
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        Lazily creates the shared async HTTP client.
+        """
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.BASE_URL,
+                http2=self.http2,
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size
+                )
+            )
+        return self._client
 
-    def _get(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    async def _get_async(self, endpoint: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
-        Private method to handle GET requests to the API.
+        Private method to handle GET requests to the API on the pooled async client.
+        The number of requests in flight is bounded by the concurrency limit.
         """
         if params is None:
             params = {}
         params["token"] = self.api_token
-        
-        url = f"{self.BASE_URL}{endpoint}"
+
         try:
-            response = requests.get(url, params=params)
-            response.raise_for_status()  # Raises an HTTPError for bad responses (4xx or 5xx)
+            async with self._semaphore:
+                response = await self._get_client().get(endpoint, params=params)
+            response.raise_for_status()  # Raises an HTTPStatusError for bad responses (4xx or 5xx)
             return response.json()
-        except requests.exceptions.RequestException as e:
+        except httpx.HTTPError as e:
             print(f"Error fetching data from Marketdata API: {e}")
             return {}
+        except ValueError as e:
+            # A response body that isn't JSON, e.g. an error page from a proxy
+            print(f"Invalid response from Marketdata API: {e}")
+            return {}
 
-    def find_option_contract(self, symbol: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    async def close(self):
         """
-        Finds the first valid option contract based on the provided criteria.
-        Corresponds to the 'Search Options API' node in the main workflow.
+        Closes the pooled HTTP connections.
         """
-        endpoint = f"options/chain/{symbol}/"
-        data = self._get(endpoint, params=payload)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
 
+    def _build_contract(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Adapts the first row of a chain response to a more convenient structure.
+        """
         if not data or "optionSymbol" not in data or not data["optionSymbol"]:
             return None
 
-        # Adapt the response to a more convenient structure
-        option = {
+        return {
             "symbol": data["optionSymbol"][0],
             "type": data["side"][0].upper(),
             "underlying": data["underlying"][0],
@@ -57,30 +97,87 @@ class MarketDataService:
             "underlying_price": data["underlyingPrice"][0],
             "expiration_date": data["expiration"][0] # Unix timestamp
         }
-        return option
 
-    def get_option_quote(self, underlying_symbol: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    async def find_option_contract_async(self, symbol: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
-        Gets the latest quote for a specific option by fetching the chain and taking the first result.
-        This is used for faster price updates as the /chain endpoint has less delay.
+        Finds the first valid option contract based on the provided criteria.
+        Corresponds to the 'Search Options API' node in the main workflow.
         """
-        # Ensure the query is limited to the single, exact contract we want.
-        params["limit"] = 1
-        endpoint = f"options/chain/{underlying_symbol}/"
-        data = self._get(endpoint, params=params)
+        endpoint = f"options/chain/{symbol}/"
+        return self._build_contract(await self._get_async(endpoint, params=payload))
 
-        if not data or "optionSymbol" not in data or not data["optionSymbol"]:
+    def _build_quote(self, data: Dict[str, Any], index: int) -> Dict[str, Any]:
+        """
+        Builds a quote dictionary from a single row of a columnar chain response.
+        """
+        return {
+            "last": data["last"][index],
+            "bid": data["bid"][index],
+            "ask": data["ask"][index],
+            "mid": (data["bid"][index] + data["ask"][index]) / 2,
+            "volume": data["volume"][index],
+            "underlying_price": data["underlyingPrice"][index]
+        }
+
+    def _build_chain_params(self, expiration: str, strikes: Iterable[float], sides: Iterable[str]) -> Optional[Dict[str, Any]]:
+        """
+        Builds chain query parameters covering the union of the requested strikes and sides.
+        """
+        unique_strikes = sorted(set(strikes))
+        unique_sides = set(side.lower() for side in sides)
+        if not unique_strikes:
             return None
-            
-        quote = {
-            "last": data["last"][0],
-            "bid": data["bid"][0],
-            "ask": data["ask"][0],
-            "mid": (data["bid"][0] + data["ask"][0]) / 2,
-            "volume": data["volume"][0],
-            "underlying_price": data["underlyingPrice"][0]
+
+        params = {
+            "expiration": expiration,
+            "strike": ",".join(f"{strike:g}" for strike in unique_strikes)
         }
-        return quote
+        # Only filter by side when every requested contract shares it
+        if len(unique_sides) == 1:
+            params["side"] = unique_sides.pop()
+        return params
+
+    def _build_quotes(self, data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """
+        Maps every row of a chain response to its quote, keyed by OCC option symbol.
+        """
+        if not data or "optionSymbol" not in data or not data["optionSymbol"]:
+            return {}
+
+        return {
+            option_symbol: self._build_quote(data, i)
+            for i, option_symbol in enumerate(data["optionSymbol"])
+        }
+
+    async def get_option_quotes_async(
+        self,
+        underlying_symbol: str,
+        expiration: str,
+        strikes: Iterable[float],
+        sides: Iterable[str]
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Gets the latest quotes for several contracts of one underlying and expiration
+        with a single chain request.
+
+        The chain is filtered by the union of the requested strikes and sides, so it may
+        contain a few contracts nobody asked for; callers pick their rows by OCC symbol.
+
+        Returns:
+            A dictionary mapping each OCC option symbol in the response to its quote.
+        """
+        params = self._build_chain_params(expiration, strikes, sides)
+        if params is None:
+            return {}
+
+        endpoint = f"options/chain/{underlying_symbol}/"
+        return self._build_quotes(await self._get_async(endpoint, params=params))
 
 # Create a single instance of the service to be used throughout the app
-marketdata_service = MarketDataService(api_token=settings.MARKETDATA_API_TOKEN)
\ No newline at end of file
+marketdata_service = MarketDataService(
+    api_token=settings.MARKETDATA_API_TOKEN,
+    pool_size=settings.MARKETDATA_POOL_SIZE,
+    max_concurrency=settings.MARKETDATA_MAX_CONCURRENCY,
+    timeout=settings.MARKETDATA_TIMEOUT,
+    http2=settings.MARKETDATA_HTTP2
+)
@@ -0,0 +1,318 @@
+import asyncio
+from datetime import datetime, timedelta
+from sqlalchemy import delete, exists, func, or_, select, update
+from sqlalchemy.orm import aliased, undefer
+from typing import Any, Dict, List, Optional, Set
+
+from .. import database
+from ..config import settings
+from .telegram_service import TelegramDispatcher, Priority, telegram_dispatcher
+
+class TelegramOutbox:
+    """
+    A database-backed outbox for Telegram notifications.
+
+    Enqueueing only appends to an in-memory buffer, so hot paths never wait on the
+    database or the network. A background sender persists the buffer in batches,
+    claims pending rows in priority order and hands them to the dispatcher. Rows stay
+    pending until Telegram confirms delivery, so messages survive restarts and are
+    retried up to `max_attempts` times. Idempotency keys make repeated enqueues of the
+    same notification (e.g. a re-run report job) a no-op.
+
+    Messages enqueued with the same `ordering_key` (e.g. the alerts of one trade) are
+    delivered in the order they were enqueued: a message isn't sent while an earlier
+    one with its key is still pending, including while that one waits for a retry.
+
+    The sender doesn't poll the table while idle: it wakes up when a message is
+    enqueued, when a send finishes, or when the earliest scheduled retry is due, and
+    only falls back to retrying after `poll_interval` when the database failed.
+
+    Every enqueue returns a future resolving to whether the message was delivered.
+    """
+    def __init__(
+        self,
+        dispatcher: TelegramDispatcher,
+        poll_interval: float,
+        batch_size: int,
+        max_attempts: int,
+        retry_delay: float,
+        retention_days: float
+    ):
+        self.dispatcher = dispatcher
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.retention_days = retention_days
+        self._buffer: List[Dict[str, Any]] = []
+        self._futures: Dict[str, asyncio.Future] = {}
+        self._in_flight: Set[int] = set()
+        # Running send tasks, referenced so they aren't garbage collected mid-send
+        self._send_tasks: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        # When the sender has to look at the table again without being woken up
+        self._next_due: Optional[datetime] = None
+        self._last_purge: Optional[datetime] = None
+
+    def _enqueue(
+        self,
+        key: str,
+        method: str,
+        priority: Priority,
+        text: Optional[str] = None,
+        payload: Optional[bytes] = None,
+        filename: Optional[str] = None,
+        ordering_key: Optional[str] = None
+    ) -> asyncio.Future:
+        future = self._futures.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._futures[key] = future
+            self._buffer.append({
+                "idempotency_key": key,
+                "method": method,
+                "priority": int(priority),
+                "text": text,
+                "payload": payload,
+                "filename": filename,
+                "ordering_key": ordering_key,
+                "status": database.OutboxStatus.PENDING,
+                "attempts": 0,
+                "created_at": datetime.utcnow(),
+            })
+            self._wakeup.set()
+        return future
+
+    def send_message(
+        self,
+        text: str,
+        key: str,
+        priority: Priority = Priority.UPDATE,
+        ordering_key: Optional[str] = None
+    ) -> asyncio.Future:
+        """
+        Enqueues a text message.
+        """
+        return self._enqueue(key, "sendMessage", priority, text=text, ordering_key=ordering_key)
+
+    def send_photo(
+        self,
+        photo_data: bytes,
+        key: str,
+        caption: Optional[str] = None,
+        priority: Priority = Priority.UPDATE,
+        ordering_key: Optional[str] = None
+    ) -> asyncio.Future:
+        """
+        Enqueues a photo with an optional caption.
+        """
+        return self._enqueue(key, "sendPhoto", priority, text=caption, payload=photo_data, ordering_key=ordering_key)
+
+    def send_document(
+        self,
+        document_data: bytes,
+        filename: str,
+        key: str,
+        caption: Optional[str] = None,
+        priority: Priority = Priority.REPORT
+    ) -> asyncio.Future:
+        """
+        Enqueues a document with an optional caption.
+        """
+        return self._enqueue(key, "sendDocument", priority, text=caption, payload=document_data, filename=filename)
+
+    def _insert_ignoring_duplicates(self):
+        if database.engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        return insert(database.OutboxMessage).on_conflict_do_nothing(index_elements=["idempotency_key"])
+
+    async def _persist(self, rows: List[Dict[str, Any]]) -> Dict[str, database.OutboxStatus]:
+        """
+        Inserts buffered messages, skipping keys that already exist.
+        Returns the keys that turned out to be finished already, with their status.
+        """
+        async with database.write_session() as db:
+            await db.execute(self._insert_ignoring_duplicates(), rows)
+            finished = await db.execute(
+                select(database.OutboxMessage.idempotency_key, database.OutboxMessage.status).where(
+                    database.OutboxMessage.idempotency_key.in_([row["idempotency_key"] for row in rows]),
+                    database.OutboxMessage.status != database.OutboxStatus.PENDING
+                )
+            )
+            return dict(finished.all())
+
+    async def _claim(self, exclude: Set[int]) -> List[Dict[str, Any]]:
+        """
+        Loads the next batch of pending messages that are due and not already being sent.
+        A message waits while an earlier message with its ordering key is pending.
+        """
+        earlier = aliased(database.OutboxMessage)
+        query = select(database.OutboxMessage).options(undefer(database.OutboxMessage.payload)).where(
+            database.OutboxMessage.status == database.OutboxStatus.PENDING,
+            or_(
+                database.OutboxMessage.next_attempt_at.is_(None),
+                database.OutboxMessage.next_attempt_at <= datetime.utcnow()
+            ),
+            ~exists().where(
+                earlier.ordering_key == database.OutboxMessage.ordering_key,
+                earlier.status == database.OutboxStatus.PENDING,
+                earlier.id < database.OutboxMessage.id
+            )
+        )
+        if exclude:
+            query = query.where(database.OutboxMessage.id.notin_(exclude))
+        async with database.AsyncSessionLocal() as db:
+            messages = (await db.scalars(
+                query.order_by(database.OutboxMessage.priority, database.OutboxMessage.id).limit(self.batch_size)
+            )).all()
+        return [
+            {
+                "id": message.id,
+                "idempotency_key": message.idempotency_key,
+                "method": message.method,
+                "priority": message.priority,
+                "text": message.text,
+                "payload": message.payload,
+                "filename": message.filename,
+                "attempts": message.attempts,
+            }
+            for message in messages
+        ]
+
+    async def _next_retry_at(self) -> Optional[datetime]:
+        """
+        The earliest time a pending message waiting for a retry becomes due.
+        """
+        async with database.AsyncSessionLocal() as db:
+            return await db.scalar(
+                select(func.min(database.OutboxMessage.next_attempt_at)).where(
+                    database.OutboxMessage.status == database.OutboxStatus.PENDING,
+                    database.OutboxMessage.next_attempt_at > datetime.utcnow()
+                )
+            )
+
+    async def _record_result(self, message: Dict[str, Any], delivered: bool):
+        attempts = message["attempts"] + 1
+        if delivered:
+            values = {"status": database.OutboxStatus.SENT, "sent_at": datetime.utcnow()}
+        elif attempts >= self.max_attempts:
+            values = {"status": database.OutboxStatus.FAILED, "last_error": "Delivery failed"}
+        else:
+            values = {
+                "last_error": "Delivery failed",
+                "next_attempt_at": datetime.utcnow() + timedelta(seconds=self.retry_delay * attempts)
+            }
+        async with database.write_session() as db:
+            await db.execute(
+                update(database.OutboxMessage).where(database.OutboxMessage.id == message["id"]).values(
+                    attempts=attempts, **values
+                )
+            )
+
+    async def _purge(self):
+        """
+        Deletes delivered messages older than the retention period.
+        """
+        async with database.write_session() as db:
+            await db.execute(
+                delete(database.OutboxMessage).where(
+                    database.OutboxMessage.status == database.OutboxStatus.SENT,
+                    database.OutboxMessage.sent_at < datetime.utcnow() - timedelta(days=self.retention_days)
+                )
+            )
+
+    async def _send(self, message: Dict[str, Any]):
+        priority = Priority(message["priority"])
+        delivered = False
+        try:
+            if message["method"] == "sendMessage":
+                delivered = await self.dispatcher.send_message(message["text"], priority=priority)
+            elif message["method"] == "sendPhoto":
+                delivered = await self.dispatcher.send_photo(message["payload"], caption=message["text"], priority=priority)
+            else:
+                delivered = await self.dispatcher.send_document(
+                    message["payload"], message["filename"], caption=message["text"], priority=priority
+                )
+            await self._record_result(message, delivered)
+        except Exception as e:
+            print(f"Error sending outbox message {message['id']}: {e}")
+        finally:
+            self._in_flight.discard(message["id"])
+            # Claim the messages that were waiting on this one or on the batch size
+            self._wakeup.set()
+
+        # Resolve the caller's future once the message is delivered or given up on
+        if delivered or message["attempts"] + 1 >= self.max_attempts:
+            self._resolve(message["idempotency_key"], delivered)
+
+    def _resolve(self, key: str, delivered: bool):
+        future = self._futures.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(delivered)
+
+    async def _drain_once(self):
+        if self._buffer:
+            rows, self._buffer = self._buffer, []
+            try:
+                finished = await self._persist(rows)
+            except Exception as e:
+                print(f"Error persisting outbox messages: {e}")
+                self._buffer = rows + self._buffer
+                self._next_due = datetime.utcnow() + timedelta(seconds=self.poll_interval)
+                return
+            # Duplicates of notifications handled before (e.g. prior to a restart)
+            for key, status in finished.items():
+                self._resolve(key, status == database.OutboxStatus.SENT)
+
+        for message in await self._claim(set(self._in_flight)):
+            self._in_flight.add(message["id"])
+            task = asyncio.create_task(self._send(message))
+            self._send_tasks.add(task)
+            task.add_done_callback(self._send_tasks.discard)
+        self._next_due = await self._next_retry_at()
+
+        now = datetime.utcnow()
+        if self._last_purge is None or now - self._last_purge > timedelta(hours=1):
+            self._last_purge = now
+            await self._purge()
+
+    async def run(self):
+        """
+        Persists enqueued messages and sends pending ones until cancelled.
+        """
+        print("Starting Telegram outbox sender...")
+        try:
+            # Look at the table once on startup for messages left from before a restart
+            self._wakeup.set()
+            while True:
+                timeout = None
+                if self._next_due is not None:
+                    timeout = max(0.0, (self._next_due - datetime.utcnow()).total_seconds())
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                self._next_due = None
+                try:
+                    await self._drain_once()
+                except Exception as e:
+                    print(f"Error in Telegram outbox sender: {e}")
+                    self._next_due = datetime.utcnow() + timedelta(seconds=self.poll_interval)
+        finally:
+            # Persist what is still buffered so it is sent after the restart
+            if self._buffer:
+                rows, self._buffer = self._buffer, []
+                await self._persist(rows)
+
+# Create a single outbox to be used throughout the app
+telegram_outbox = TelegramOutbox(
+    telegram_dispatcher,
+    poll_interval=settings.OUTBOX_POLL_INTERVAL,
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+    retry_delay=settings.OUTBOX_RETRY_DELAY,
+    retention_days=settings.OUTBOX_RETENTION_DAYS
+)
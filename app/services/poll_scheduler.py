@@ -0,0 +1,151 @@
+import math
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ..config import settings
+from .rate_limit import TokenBucket
+from .trade_book import ActiveTrade
+
+class PollState:
+    """
+    Scheduling state of one trade: when it is due and how volatile its price has been.
+    """
+    __slots__ = ("next_due", "interval", "last_price", "last_seen", "variance")
+
+    def __init__(self, now: float):
+        self.next_due = now
+        self.interval = 0.0
+        self.last_price: Optional[float] = None
+        self.last_seen: Optional[float] = None
+        # EWMA of squared log returns per second; None until two prices were seen
+        self.variance: Optional[float] = None
+
+class PollScheduler:
+    """
+    Decides which option chains the price loop fetches on each tick.
+
+    Every trade gets its own poll interval: the expected time for its price to reach the
+    nearest threshold (the next profit goal or the stop loss), estimated from its recent
+    volatility as a random walk, scaled down by `safety_factor` and clamped to
+    [`min_interval`, `max_interval`].
+
+    A chain (underlying and expiration) costs one request no matter how many trades it
+    serves, and refreshes all of them. Due chains are fetched most urgent first, as
+    long as the per-second request budget allows; the rest wait for the next tick.
+    """
+    def __init__(
+        self,
+        requests_per_second: float,
+        min_interval: float,
+        max_interval: float,
+        safety_factor: float,
+        volatility_half_life: float
+    ):
+        self.budget = TokenBucket(rate=requests_per_second, capacity=max(1.0, requests_per_second))
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.safety_factor = safety_factor
+        self.volatility_half_life = volatility_half_life
+        self.deferred = 0
+        self._states: Dict[int, PollState] = {}
+
+    def reset(self):
+        """
+        Forgets all due times and volatility estimates, e.g. after the market was closed.
+        """
+        self._states.clear()
+
+    def _state(self, trade_id: int, now: float) -> PollState:
+        state = self._states.get(trade_id)
+        if state is None:
+            state = self._states[trade_id] = PollState(now)
+        return state
+
+    def select(self, trades: Iterable[ActiveTrade], now: Optional[float] = None) -> List[ActiveTrade]:
+        """
+        Returns the trades to fetch this tick: every trade of the due chains the budget allows.
+        """
+        now = time.monotonic() if now is None else now
+        groups: Dict[Tuple[str, str], List[ActiveTrade]] = defaultdict(list)
+        active = set()
+        for trade in trades:
+            active.add(trade.id)
+            groups[(trade.underlying, trade.expiration_date.strftime('%Y-%m-%d'))].append(trade)
+
+        # Forget trades that left the book
+        for trade_id in self._states.keys() - active:
+            del self._states[trade_id]
+
+        due = []
+        for group in groups.values():
+            # How far past due the most urgent trade of the chain is, relative to its interval
+            urgency = max(
+                (now - state.next_due) / max(state.interval, self.min_interval)
+                for state in (self._state(trade.id, now) for trade in group)
+            )
+            if urgency >= 0:
+                due.append((urgency, group))
+        due.sort(key=lambda item: item[0], reverse=True)
+
+        selected = []
+        for index, (_, group) in enumerate(due):
+            if not self.budget.try_acquire():
+                self.deferred += len(due) - index
+                break
+            selected.extend(group)
+        return selected
+
+    def _distance_to_threshold(self, trade: ActiveTrade, price: float) -> Optional[float]:
+        """
+        The log distance from the price to the nearest goal or stop loss price.
+        """
+        thresholds = [trade.entry_price * (1 - settings.STOP_LOSS_PERCENT / 100)]
+        goals = (
+            settings.GOAL_1_PERCENT, settings.GOAL_2_PERCENT, settings.GOAL_3_PERCENT,
+            settings.GOAL_4_PERCENT, settings.GOAL_5_PERCENT
+        )
+        last_goal = trade.last_goal_achieved or 0
+        if last_goal < len(goals):
+            thresholds.append(trade.entry_price * (1 + goals[last_goal] / 100))
+        if price <= 0 or any(threshold <= 0 for threshold in thresholds):
+            return None
+        return min(abs(math.log(threshold / price)) for threshold in thresholds)
+
+    def observe(self, trade: ActiveTrade, price: Optional[float], now: Optional[float] = None):
+        """
+        Records the result of a fetch for a trade and schedules its next poll.
+        """
+        now = time.monotonic() if now is None else now
+        state = self._state(trade.id, now)
+
+        if price is not None and price > 0:
+            if state.last_price is not None and now > state.last_seen:
+                elapsed = now - state.last_seen
+                sample = math.log(price / state.last_price) ** 2 / elapsed
+                weight = 1 - 0.5 ** (elapsed / self.volatility_half_life)
+                state.variance = sample if state.variance is None else state.variance + weight * (sample - state.variance)
+            state.last_price, state.last_seen = price, now
+
+        distance = self._distance_to_threshold(trade, price) if price else None
+        if distance is None or state.variance is None:
+            # No quote or no volatility estimate yet
+            interval = self.min_interval
+        elif state.variance == 0:
+            # The price hasn't moved at all: nowhere near a threshold
+            interval = self.max_interval
+        else:
+            # Expected time for a random walk to cover the distance
+            expected = distance ** 2 / state.variance
+            interval = min(self.max_interval, max(self.min_interval, self.safety_factor * expected))
+        state.interval = interval
+        state.next_due = now + interval
+
+# Create a single scheduler for the price updater
+poll_scheduler = PollScheduler(
+    requests_per_second=settings.MARKETDATA_REQUESTS_PER_SECOND,
+    min_interval=settings.POLL_MIN_INTERVAL,
+    max_interval=settings.POLL_MAX_INTERVAL,
+    safety_factor=settings.POLL_SAFETY_FACTOR,
+    volatility_half_life=settings.POLL_VOLATILITY_HALF_LIFE
+)
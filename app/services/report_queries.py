@@ -0,0 +1,87 @@
+from datetime import date, datetime, time, timedelta
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from .. import database
+from .daily_stats import trade_result
+
+# Option prices are quoted per share; one contract covers 100 shares
+CONTRACT_MULTIPLIER = 100
+
+def closed_between(start_date: date, end_date: Optional[date] = None) -> list:
+    """
+    Filter criteria for trades closed on or after `start_date` and, if given, on or before `end_date`.
+    The dates become a half-open datetime range on the raw column so the
+    (status, closed_at) index can be used.
+    """
+    criteria = [
+        database.Trade.status == database.TradeStatus.CLOSED,
+        database.Trade.closed_at >= datetime.combine(start_date, time.min)
+    ]
+    if end_date is not None:
+        criteria.append(database.Trade.closed_at < datetime.combine(end_date + timedelta(days=1), time.min))
+    return criteria
+
+async def get_period_summary(db: AsyncSession, start_date: date, end_date: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Computes the trade count, win/loss counts and profit/loss sums for a period
+    by summing the daily stats rollup, i.e. at most one row per day.
+    """
+    query = select(
+        func.sum(database.DailyStats.total_trades),
+        func.sum(database.DailyStats.winning_trades),
+        func.sum(database.DailyStats.total_profit),
+        func.sum(database.DailyStats.total_loss)
+    ).where(database.DailyStats.day >= start_date)
+    if end_date is not None:
+        query = query.where(database.DailyStats.day <= end_date)
+    total_trades, winning_trades, total_profit, total_loss = (await db.execute(query)).one()
+
+    total_trades = total_trades or 0
+    winning_trades = winning_trades or 0
+    return {
+        "total_trades": total_trades,
+        "winning_trades": winning_trades,
+        "losing_trades": total_trades - winning_trades,
+        "total_profit": (total_profit or 0.0) * CONTRACT_MULTIPLIER,
+        "total_loss": (total_loss or 0.0) * CONTRACT_MULTIPLIER,
+    }
+
+def trade_rows_query(start_date: date, end_date: Optional[date] = None):
+    """
+    Selects only the columns the report table needs, in closing order.
+    """
+    return select(
+        database.Trade.underlying, database.Trade.entry_price, database.Trade.exit_price
+    ).where(
+        *closed_between(start_date, end_date)
+    ).order_by(database.Trade.closed_at)
+
+async def stream_trade_rows(
+    db: AsyncSession,
+    start_date: date,
+    end_date: Optional[date] = None,
+    batch_size: int = 1000
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streams the report table rows for a period in batches.
+    """
+    result = await db.stream(trade_rows_query(start_date, end_date).execution_options(yield_per=batch_size))
+    async for underlying, entry_price, exit_price in result:
+        yield {
+            "symbol": underlying,
+            "entryPrice": f"{entry_price:.2f}",
+            "peakPrice": f"{exit_price or 0:.2f}",
+            "isWinner": trade_result(entry_price, exit_price) > 0,
+        }
+
+async def load_period_report(start_date: date, end_date: Optional[date] = None) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    Loads the summary and table rows of a period report in its own session.
+    """
+    async with database.AsyncSessionLocal() as db:
+        summary = await get_period_summary(db, start_date, end_date)
+        if not summary["total_trades"]:
+            return summary, []
+        return summary, [row async for row in stream_trade_rows(db, start_date, end_date)]
@@ -1,5 +1,31 @@
+from functools import lru_cache
+from html import escape
 from typing import Dict, Any
 
+# Bump whenever the trade alert's markup or styling changes, so cached renders are invalidated
+TRADE_ALERT_TEMPLATE_VERSION = 1
+
+@lru_cache(maxsize=None)
+def _trade_alert_header(price_change_color: str, underlying_change_color: str) -> str:
+    """
+    Builds the static opening of the trade alert SVG; there is one per color combination.
+    """
+    return f"""
+    <svg width="632" height="216" viewBox="0 0 632 216" xmlns="http://www.w3.org/2000/svg">
+        <style>
+            .text {{ font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, Helvetica, Arial, sans-serif; }}
+            .header-main {{ font-size: 20px; font-weight: 400; fill: #FFFFFF; }}
+            .header-sub {{ font-size: 12px; font-weight: 400; fill: #9DB2CE; }}
+            .price-large {{ font-size: 60px; font-weight: 700; fill: {price_change_color}; }}
+            .price-change {{ font-size: 18px; font-weight: 600; fill: {price_change_color}; }}
+            .stat-label {{ font-size: 18px; font-weight: 400; fill: #9DB2CE; }}
+            .stat-value {{ font-size: 18px; font-weight: 400; fill: #c7d9f0; text-anchor: end; }}
+            .footer-text {{ font-size: 15px; font-weight: 500; fill: #c7d9f0; }}
+            .footer-change {{ fill: {underlying_change_color}; }}
+        </style>
+        <rect width="100%" height="100%" fill="#131722" />
+"""
+
 def get_trade_alert_svg(data: Dict[str, Any]) -> str:
     """
     Generates the SVG for a new trade or a peak price update.
@@ -21,36 +47,23 @@ def get_trade_alert_svg(data: Dict[str, Any]) -> str:
         formatted_exp_date = "Invalid Date"
 
     # --- Formatted Strings ---
-    header_sub_text = f"{formatted_exp_date} (W) {data.get('type', 'N/A')} 100"
+    header_sub_text = escape(f"{formatted_exp_date} (W) {data.get('type', 'N/A')} 100")
     price_change_value_display = f"{'+' if is_price_profit else ''}{data.get('price_change_value', 0):.2f}"
     price_change_percent_display = f"{'+' if is_price_profit else ''}{data.get('price_change_percent', 0):.2f}%"
     price_change_string = f"{price_change_icon}{price_change_value_display} {price_change_percent_display}"
     underlying_price_string = f"{data.get('underlying_price', 0):.2f}"
     underlying_percent_string = f"{'+' if is_underlying_profit else ''}{data.get('underlying_change_percent', 0):.2f}%"
-    footer_status_string = f"{data.get('status', 'N/A')}, {data.get('time', 'N/A')} ET"
+    footer_status_string = escape(f"{data.get('status', 'N/A')}, {data.get('time', 'N/A')} ET")
     formatted_open_interest = f"{data.get('open_interest', 0):,}"
     formatted_volume = f"{data.get('volume', 0):,}"
-    formatted_underlying_symbol = str(data.get('underlying', 'N/A')).replace('W', '')
+    formatted_underlying_symbol = escape(str(data.get('underlying', 'N/A')).replace('W', ''))
 
-    svg_template = f"""
-    <svg width="632" height="216" viewBox="0 0 632 216" xmlns="http://www.w3.org/2000/svg">
-        <style>
-            .text {{ font-family: -apple-system, BlinkMacSystemFont, "Segoe UI", Roboto, Helvetica, Arial, sans-serif; }}
-            .header-main {{ font-size: 20px; font-weight: 400; fill: #FFFFFF; }}
-            .header-sub {{ font-size: 12px; font-weight: 400; fill: #9DB2CE; }}
-            .price-large {{ font-size: 60px; font-weight: 700; fill: {price_change_color}; }}
-            .price-change {{ font-size: 18px; font-weight: 600; fill: {price_change_color}; }}
-            .stat-label {{ font-size: 18px; font-weight: 400; fill: #9DB2CE; }}
-            .stat-value {{ font-size: 18px; font-weight: 400; fill: #c7d9f0; text-anchor: end; }}
-            .footer-text {{ font-size: 15px; font-weight: 500; fill: #c7d9f0; }}
-            .footer-change {{ fill: {underlying_change_color}; }}
-        </style>
-        <rect width="100%" height="100%" fill="#131722" />
+    svg_template = _trade_alert_header(price_change_color, underlying_change_color) + f"""
         <g transform="translate(0, -10)">
             <g transform="translate(0, 10)">
                 <path d="M 35 54 L 25 42 L 35 30" stroke="#FFFFFF" fill="none" stroke-width="2.5" stroke-linecap="round" stroke-linejoin="round"/>
             </g>
-            <text x="55" y="48" class="text header-main">{data.get('underlying', 'N/A')} ${data.get('strike_price', 0)}</text>
+            <text x="55" y="48" class="text header-main">{escape(str(data.get('underlying', 'N/A')))} ${data.get('strike_price', 0)}</text>
             <text x="55" y="70" class="text header-sub">{header_sub_text}</text>
             <g transform="translate(580, 28) scale(1.2)">
                 <path d="M19 14v3h3v2h-3.001L19 22h-2l-.001-3H14v-2h3v-3h2zm1.243-9.243c2.262 2.268 2.34 5.88.236 8.235l-1.42-1.418c1.331-1.524 1.261-3.914-.232-5.404-1.503-1.499-3.92-1.563-5.49-.153l-1.335 1.198-1.336-1.197c-1.575-1.412-3.991-1.35-5.494.154-1.49 1.49-1.565 3.875-.192 5.451l8.432 8.446L12 21.485 3.52 12.993c-2.104-2.356-2.025-5.974.236-8.236 2.265-2.264 5.888-2.34 8.244-.228 2.349-2.109 5.979-2.039 8.242.228z" fill="#FFFFFF"/>
@@ -111,7 +124,7 @@ def get_daily_report_html(
     is_successful: bool,
     entry_image_b64: str,
     peak_image_b64: str,
-    background_image_b64: str
+    background_image_url: str
 ) -> str:
     """
     Generates the HTML for the daily "before and after" report image.
@@ -121,7 +134,6 @@ def get_daily_report_html(
     # they need the data URL prefix to be used in HTML.
     entry_image_data_url = f"data:image/png;base64,{entry_image_b64}"
     peak_image_data_url = f"data:image/png;base64,{peak_image_b64}"
-    background_image_data_url = f"data:image/jpeg;base64,{background_image_b64}"
 
     if is_successful:
         content_html = f"""
@@ -185,7 +197,7 @@ def get_daily_report_html(
     </head>
     <body>
         <div class="container">
-            <img class="background-overlay" src="{background_image_data_url}" />
+            <img class="background-overlay" src="{background_image_url}" />
             <div class="content">
                 {content_html}
             </div>
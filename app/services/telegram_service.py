@@ -1,11 +1,15 @@
-import requests
-from typing import Optional
+import asyncio
+import enum
+import itertools
+import httpx
+from typing import Any, Dict, Optional
 
 from ..config import settings
+from .rate_limit import TokenBucket
 
 class TelegramService:
     """
-    A service to interact with the Telegram Bot API.
+    The Telegram Bot API credentials and endpoint; messages are sent by the `TelegramDispatcher`.
     """
     def __init__(self, bot_token: str, chat_id: str):
         if not bot_token or not chat_id:
@@ -14,71 +18,164 @@ class TelegramService:
         self.chat_id = chat_id
         self.base_url = f"https://api.telegram.org/bot{self.bot_token}"
 
-    def send_message(self, text: str) -> bool:
+class Priority(enum.IntEnum):
+    """
+    Delivery priority of outbound Telegram messages; lower values are sent first.
+    """
+    STOP_LOSS = 0
+    GOAL = 1
+    UPDATE = 2
+    REPORT = 3
+
+class OutboundMessage:
+    """
+    A message waiting in the dispatcher queue.
+    """
+    __slots__ = ("method", "data", "files", "future")
+
+    def __init__(self, method: str, data: Dict[str, Any], files: Optional[Dict[str, Any]], future: asyncio.Future):
+        self.method = method
+        self.data = data
+        self.files = files
+        self.future = future
+
+class TelegramDispatcher:
+    """
+    Sends Telegram messages asynchronously from a priority queue over a pooled connection.
+
+    Sends are paced by token buckets for Telegram's per-chat and global limits, and a
+    429 response pauses the queue for the `retry_after` Telegram asks for before retrying.
+    Every send method enqueues and returns a future resolving to whether the message was
+    delivered, so callers can either await it or fire and forget.
+    """
+    def __init__(
+        self,
+        service: TelegramService,
+        chat_rate_per_minute: float,
+        chat_burst: int,
+        global_rate_per_second: float,
+        max_retries: int,
+        timeout: float
+    ):
+        self.service = service
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self._chat_bucket = TokenBucket(chat_rate_per_minute / 60, chat_burst)
+        self._global_bucket = TokenBucket(global_rate_per_second, global_rate_per_second)
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        # Keeps FIFO order between messages of the same priority
+        self._sequence = itertools.count()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.service.base_url + "/",
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(max_connections=2, max_keepalive_connections=2)
+            )
+        return self._client
+
+    def _enqueue(self, method: str, data: Dict[str, Any], files: Optional[Dict[str, Any]], priority: Priority) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        data = {"chat_id": self.service.chat_id, **data}
+        self._queue.put_nowait((priority, next(self._sequence), OutboundMessage(method, data, files, future)))
+        return future
+
+    def send_message(self, text: str, priority: Priority = Priority.UPDATE) -> asyncio.Future:
         """
-        Sends a text message to the configured chat ID.
+        Queues a text message to the configured chat ID.
         """
-        url = f"{self.base_url}/sendMessage"
-        payload = {
-            "chat_id": self.chat_id,
-            "text": text,
-            "parse_mode": "Markdown"
-        }
-        try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            return response.json().get("ok", False)
-        except requests.exceptions.RequestException as e:
-            print(f"Error sending Telegram message: {e}")
-            return False
+        return self._enqueue("sendMessage", {"text": text, "parse_mode": "Markdown"}, None, priority)
 
-    def send_photo(self, photo_data: bytes, caption: Optional[str] = None) -> bool:
+    def send_photo(self, photo_data: bytes, caption: Optional[str] = None, priority: Priority = Priority.UPDATE) -> asyncio.Future:
         """
-        Sends a photo to the configured chat ID.
-        
-        Args:
-            photo_data: The binary content of the photo.
-            caption: Optional text to send with the photo.
+        Queues a photo to the configured chat ID.
         """
-        url = f"{self.base_url}/sendPhoto"
-        files = {"photo": ("image.png", photo_data, "image/png")}
-        data = {"chat_id": self.chat_id}
-        if caption:
-            data["caption"] = caption
+        data = {"caption": caption} if caption else {}
+        return self._enqueue("sendPhoto", data, {"photo": ("image.png", photo_data, "image/png")}, priority)
 
-        try:
-            response = requests.post(url, files=files, data=data)
-            response.raise_for_status()
-            return response.json().get("ok", False)
-        except requests.exceptions.RequestException as e:
-            print(f"Error sending Telegram photo: {e}")
-            return False
+    def send_document(
+        self,
+        document_data: bytes,
+        filename: str,
+        caption: Optional[str] = None,
+        priority: Priority = Priority.REPORT
+    ) -> asyncio.Future:
+        """
+        Queues a document (e.g., PDF) to the configured chat ID.
+        """
+        data = {"caption": caption} if caption else {}
+        return self._enqueue("sendDocument", data, {"document": (filename, document_data)}, priority)
 
-    def send_document(self, document_data: bytes, filename: str, caption: Optional[str] = None) -> bool:
+    async def _deliver(self, message: OutboundMessage) -> bool:
         """
-        Sends a document (e.g., PDF) to the configured chat ID.
-        
-        Args:
-            document_data: The binary content of the file.
-            filename: The name of the file (e.g., "report.pdf").
-            caption: Optional text to send with the document.
+        Sends one message, honouring rate limits and retrying throttled or failed attempts.
         """
-        url = f"{self.base_url}/sendDocument"
-        files = {"document": (filename, document_data)}
-        data = {"chat_id": self.chat_id}
-        if caption:
-            data["caption"] = caption
+        for attempt in range(self.max_retries + 1):
+            await self._chat_bucket.acquire()
+            await self._global_bucket.acquire()
+            try:
+                # Text messages go as JSON, uploads as multipart form data
+                if message.files:
+                    response = await self._get_client().post(message.method, data=message.data, files=message.files)
+                else:
+                    response = await self._get_client().post(message.method, json=message.data)
+            except httpx.HTTPError as e:
+                print(f"Error sending Telegram {message.method} (attempt {attempt + 1}): {e}")
+                await asyncio.sleep(min(2 ** attempt, 30))
+                continue
 
-        try:
-            response = requests.post(url, files=files, data=data)
-            response.raise_for_status()
+            if response.status_code == 429:
+                retry_after = response.json().get("parameters", {}).get("retry_after", 1)
+                print(f"Telegram rate limit hit. Retrying {message.method} in {retry_after}s.")
+                # Pauses the whole queue, since the limit applies to the chat
+                await asyncio.sleep(retry_after)
+                continue
+            if response.status_code >= 500:
+                print(f"Telegram server error {response.status_code} for {message.method} (attempt {attempt + 1}).")
+                await asyncio.sleep(min(2 ** attempt, 30))
+                continue
+            if response.is_error:
+                print(f"Error sending Telegram {message.method}: {response.status_code} {response.text}")
+                return False
             return response.json().get("ok", False)
-        except requests.exceptions.RequestException as e:
-            print(f"Error sending Telegram document: {e}")
-            return False
+
+        print(f"Giving up on Telegram {message.method} after {self.max_retries + 1} attempts.")
+        return False
+
+    async def run(self):
+        """
+        Drains the queue, highest priority first.
+        """
+        print("Starting Telegram dispatcher...")
+        try:
+            while True:
+                _, _, message = await self._queue.get()
+                try:
+                    delivered = await self._deliver(message)
+                except Exception as e:
+                    print(f"Unexpected error in Telegram dispatcher: {e}")
+                    delivered = False
+                if not message.future.done():
+                    message.future.set_result(delivered)
+        finally:
+            if self._client is not None:
+                await self._client.aclose()
+                self._client = None
 
 # Create a single instance of the service to be used throughout the app
 telegram_service = TelegramService(
     bot_token=settings.TELEGRAM_BOT_TOKEN,
     chat_id=settings.TELEGRAM_CHAT_ID
-)
\ No newline at end of file
+)
+
+# Create a single dispatcher for all outbound messages sent from async code
+telegram_dispatcher = TelegramDispatcher(
+    telegram_service,
+    chat_rate_per_minute=settings.TELEGRAM_CHAT_RATE_PER_MINUTE,
+    chat_burst=settings.TELEGRAM_CHAT_BURST,
+    global_rate_per_second=settings.TELEGRAM_GLOBAL_RATE_PER_SECOND,
+    max_retries=settings.TELEGRAM_MAX_RETRIES,
+    timeout=settings.TELEGRAM_TIMEOUT
+)
@@ -0,0 +1,186 @@
+import asyncio
+from datetime import datetime
+from sqlalchemy import insert, update
+from typing import Any, Dict, List, Optional
+
+from .. import database
+from ..config import settings
+from .daily_stats import record_closed_trades, trade_result
+
+class ActiveTrade:
+    """
+    A compact in-memory record of an active trade.
+    Mirrors the columns of `database.ACTIVE_TRADE_COLUMNS`.
+    """
+    __slots__ = (
+        "id",
+        "symbol",
+        "trade_type",
+        "underlying",
+        "strike",
+        "expiration_date",
+        "entry_price",
+        "current_price",
+        "peak_price_today",
+        "last_goal_achieved",
+    )
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    @classmethod
+    def from_row(cls, row) -> "ActiveTrade":
+        """
+        Builds a record from an ORM `Trade` or an active-trade projection row.
+        """
+        return cls(**{name: getattr(row, name) for name in cls.__slots__})
+
+class ActiveTradeBook:
+    """
+    Holds all active trades in memory as the source of truth for the price updater,
+    the peak alerter and the dashboard.
+
+    Changes are applied to the records immediately and written to the database in
+    batches (write-behind): on a fixed interval, or right away on state transitions
+    such as a trade closing or reaching a goal. Every price change is also buffered
+    as a tick and bulk-inserted into the price history with the same flush, and
+    closed trades are added to the daily stats in the same transaction.
+    """
+    def __init__(self, flush_interval: float):
+        self.flush_interval = flush_interval
+        self._trades: Dict[int, ActiveTrade] = {}
+        # Pending column changes per trade id, in `bulk_update_mappings` format
+        self._pending: Dict[int, Dict[str, Any]] = {}
+        # Buffered rows for the price_ticks table
+        self._ticks: List[Dict[str, Any]] = []
+        # Trades closed since the last flush, to be added to the daily stats
+        self._closed: List[Dict[str, Any]] = []
+        self._flush_requested = asyncio.Event()
+
+    async def load(self):
+        """
+        Replaces the book with the active trades currently stored in the database.
+        """
+        async with database.AsyncSessionLocal() as db:
+            rows = await database.fetch_active_trades(db)
+        self._trades = {row.id: ActiveTrade.from_row(row) for row in rows}
+        print(f"Loaded {len(self._trades)} active trades into the trade book.")
+
+    def __len__(self) -> int:
+        return len(self._trades)
+
+    def get(self, trade_id: int) -> Optional[ActiveTrade]:
+        return self._trades.get(trade_id)
+
+    def all(self) -> List[ActiveTrade]:
+        return list(self._trades.values())
+
+    def add(self, trade: database.Trade) -> ActiveTrade:
+        """
+        Adds a newly created (and already committed) trade to the book.
+        """
+        record = ActiveTrade.from_row(trade)
+        self._trades[record.id] = record
+        return record
+
+    def _mark(self, trade_id: int, **fields):
+        self._pending.setdefault(trade_id, {"id": trade_id}).update(fields)
+
+    def set_price(self, trade_id: int, current_price: float, peak_price: Optional[float] = None):
+        """
+        Records a new current price, and optionally a new peak, for a trade.
+        """
+        record = self._trades[trade_id]
+        record.current_price = current_price
+        fields = {"current_price": current_price}
+        if peak_price is not None:
+            record.peak_price_today = peak_price
+            fields["peak_price_today"] = peak_price
+        self._mark(trade_id, **fields)
+        self._ticks.append({"trade_id": trade_id, "price": current_price, "recorded_at": datetime.utcnow()})
+
+    def set_goal(self, trade_id: int, goal: int):
+        """
+        Records a newly achieved profit goal and schedules an immediate flush.
+        """
+        record = self._trades.get(trade_id)
+        if record is not None:
+            record.last_goal_achieved = goal
+        self._mark(trade_id, last_goal_achieved=goal)
+        self.request_flush()
+
+    def close(self, trade_id: int, exit_price: float, reason: str) -> Optional[ActiveTrade]:
+        """
+        Removes a trade from the book, marks it closed and schedules an immediate flush.
+        """
+        record = self._trades.pop(trade_id, None)
+        if record is None:
+            return None
+        closed_at = datetime.utcnow()
+        self._mark(
+            trade_id,
+            status=database.TradeStatus.CLOSED,
+            exit_price=exit_price,
+            closed_at=closed_at,
+            close_reason=reason
+        )
+        self._closed.append({"day": closed_at.date(), "result": trade_result(record.entry_price, exit_price)})
+        self.request_flush()
+        return record
+
+    def request_flush(self):
+        self._flush_requested.set()
+
+    async def _write(self, mappings: List[Dict[str, Any]], ticks: List[Dict[str, Any]], closed: List[Dict[str, Any]]):
+        async with database.write_session() as db:
+            if mappings:
+                # ORM bulk UPDATE by primary key, executed as a single executemany
+                await db.execute(update(database.Trade), mappings)
+            if ticks:
+                # A single executemany INSERT for the whole batch
+                await db.execute(insert(database.PriceTick), ticks)
+            if closed:
+                # Same transaction, so a trade is counted exactly once
+                await record_closed_trades(db, closed)
+
+    async def flush(self):
+        """
+        Writes all pending changes and buffered ticks to the database in a single transaction.
+        On failure they are put back so the next flush retries them.
+        """
+        if not self._pending and not self._ticks:
+            return
+        pending, self._pending = self._pending, {}
+        ticks, self._ticks = self._ticks, []
+        closed, self._closed = self._closed, []
+        try:
+            await self._write(list(pending.values()), ticks, closed)
+        except Exception as e:
+            print(f"Error flushing trade book: {e}")
+            # Newer changes made during the failed flush take precedence
+            for trade_id, fields in self._pending.items():
+                pending.setdefault(trade_id, {}).update(fields)
+            self._pending = pending
+            self._ticks = ticks + self._ticks
+            self._closed = closed + self._closed
+
+    async def run_flusher(self):
+        """
+        Flushes pending changes every `flush_interval` seconds, or sooner when requested.
+        """
+        print("Starting trade book flusher...")
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._flush_requested.clear()
+                await self.flush()
+        finally:
+            # Don't lose buffered changes on shutdown
+            await self.flush()
+
+# Create a single instance of the book to be used throughout the app
+trade_book = ActiveTradeBook(flush_interval=settings.TRADE_BOOK_FLUSH_INTERVAL)
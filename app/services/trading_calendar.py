@@ -0,0 +1,192 @@
+import asyncio
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterable, Iterator, NamedTuple, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+from ..config import settings
+
+class MarketSession(NamedTuple):
+    """
+    One trading day's regular session, with UTC open and close times.
+    """
+    day: date
+    open: datetime
+    close: datetime
+    early_close: bool
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """
+    The n-th given weekday (Monday is 0) of a month; n = -1 for the last one.
+    """
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = (date(year, month + 1, 1) if month < 12 else date(year + 1, 1, 1)) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+def _easter(year: int) -> date:
+    """
+    Western Easter Sunday (anonymous Gregorian algorithm).
+    """
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+def _observed(day: date) -> date:
+    """
+    Moves a holiday falling on a weekend to the nearest weekday.
+    """
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+def _parse_dates(value: str) -> Set[date]:
+    return {date.fromisoformat(item.strip()) for item in value.split(",") if item.strip()}
+
+class TradingCalendar:
+    """
+    The US options market calendar: weekday sessions in the exchange's time zone,
+    NYSE holidays, and the early closes before Independence Day, after Thanksgiving
+    and on Christmas Eve. Session times are DST-correct; extra closures and early
+    closes can be configured for days the rules don't know about.
+    """
+    def __init__(
+        self,
+        timezone_name: str,
+        open_time: time,
+        close_time: time,
+        early_close_time: time,
+        extra_holidays: Iterable[date] = (),
+        extra_early_closes: Iterable[date] = ()
+    ):
+        self.timezone = ZoneInfo(timezone_name)
+        self.open_time = open_time
+        self.close_time = close_time
+        self.early_close_time = early_close_time
+        self.extra_holidays = set(extra_holidays)
+        self.extra_early_closes = set(extra_early_closes)
+        # Holidays and early closes by year
+        self._years: Dict[int, Tuple[Set[date], Set[date]]] = {}
+
+    def _year(self, year: int) -> Tuple[Set[date], Set[date]]:
+        cached = self._years.get(year)
+        if cached is not None:
+            return cached
+
+        holidays = {
+            _nth_weekday(year, 1, 0, 3),             # Martin Luther King Jr. Day
+            _nth_weekday(year, 2, 0, 3),             # Washington's Birthday
+            _easter(year) - timedelta(days=2),       # Good Friday
+            _nth_weekday(year, 5, 0, -1),            # Memorial Day
+            _observed(date(year, 7, 4)),             # Independence Day
+            _nth_weekday(year, 9, 0, 1),             # Labor Day
+            _nth_weekday(year, 11, 3, 4),            # Thanksgiving
+            _observed(date(year, 12, 25)),           # Christmas
+        }
+        # New Year's Day on a Saturday is not observed on the Friday before
+        new_year = date(year, 1, 1)
+        if new_year.weekday() != 5:
+            holidays.add(_observed(new_year))
+        if year >= 2022:
+            holidays.add(_observed(date(year, 6, 19)))  # Juneteenth
+        holidays |= {day for day in self.extra_holidays if day.year == year}
+
+        early_closes = {
+            date(year, 7, 3),
+            _nth_weekday(year, 11, 3, 4) + timedelta(days=1),
+            date(year, 12, 24),
+        } | {day for day in self.extra_early_closes if day.year == year}
+        early_closes = {day for day in early_closes if day.weekday() < 5 and day not in holidays}
+
+        self._years[year] = (holidays, early_closes)
+        return holidays, early_closes
+
+    def is_trading_day(self, day: date) -> bool:
+        return day.weekday() < 5 and day not in self._year(day.year)[0]
+
+    def next_trading_day(self, day: date) -> date:
+        day += timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return day
+
+    def session(self, day: date) -> Optional[MarketSession]:
+        """
+        The session of a day, or None if the market is closed all day.
+        """
+        if not self.is_trading_day(day):
+            return None
+        early_close = day in self._year(day.year)[1]
+        close_time = self.early_close_time if early_close else self.close_time
+        return MarketSession(
+            day=day,
+            open=datetime.combine(day, self.open_time, self.timezone).astimezone(timezone.utc),
+            close=datetime.combine(day, close_time, self.timezone).astimezone(timezone.utc),
+            early_close=early_close
+        )
+
+    def sessions(self, moment: Optional[datetime] = None) -> Iterator[MarketSession]:
+        """
+        The session in progress at `moment` (default now), if any, then every later one.
+        """
+        moment = moment or datetime.now(timezone.utc)
+        day = moment.astimezone(self.timezone).date()
+        while True:
+            session = self.session(day)
+            if session is not None and session.close > moment:
+                yield session
+            day += timedelta(days=1)
+
+    def next_session(self, moment: Optional[datetime] = None) -> MarketSession:
+        """
+        The session in progress at `moment` (default now), or else the next one to open.
+        """
+        return next(self.sessions(moment))
+
+    def is_open(self, moment: Optional[datetime] = None) -> bool:
+        moment = moment or datetime.now(timezone.utc)
+        return self.next_session(moment).open <= moment
+
+    def is_last_session_of(self, day: date, period: str) -> bool:
+        """
+        Whether `day` is the last trading day of its "week", "month" or "year".
+        """
+        following = self.next_trading_day(day)
+        if period == "week":
+            return following.isocalendar()[:2] != day.isocalendar()[:2]
+        if period == "month":
+            return (following.year, following.month) != (day.year, day.month)
+        if period == "year":
+            return following.year != day.year
+        raise ValueError(f"Unknown period: {period}")
+
+    async def wait_until_open(self):
+        """
+        Sleeps until the next session opens; returns at once while the market is open.
+        """
+        while True:
+            now = datetime.now(timezone.utc)
+            session = self.next_session(now)
+            if session.open <= now:
+                return
+            # Re-check at least hourly so a wall clock adjustment can't make us oversleep
+            await asyncio.sleep(min((session.open - now).total_seconds(), 3600))
+
+# Create a single calendar to be used throughout the application
+trading_calendar = TradingCalendar(
+    settings.MARKET_TIMEZONE,
+    open_time=time.fromisoformat(settings.MARKET_OPEN_TIME),
+    close_time=time.fromisoformat(settings.MARKET_CLOSE_TIME),
+    early_close_time=time.fromisoformat(settings.MARKET_EARLY_CLOSE_TIME),
+    extra_holidays=_parse_dates(settings.MARKET_EXTRA_HOLIDAYS),
+    extra_early_closes=_parse_dates(settings.MARKET_EXTRA_EARLY_CLOSES)
+)
@@ -1,20 +1,306 @@
-from typing import List
+import asyncio
+import json
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
 from fastapi import WebSocket
 
+from .config import settings
+from .services.trade_book import trade_book, ActiveTrade
+
+# Field order of the compact price update encoding
+PRICE_UPDATE_FIELDS = ("trade_id", "current_price", "peak_price")
+
+# Queued in place of a frame when a client has price updates waiting in `pending_prices`
+_PRICE_UPDATES = object()
+
+# Queued to wake the sender when a client's backlog was dropped and it needs a snapshot
+_RESYNC = object()
+
+# A sequence-numbered price update batch
+PriceBatch = Tuple[int, List[Dict[str, Any]]]
+
+def _encode(message: dict) -> str:
+    return json.dumps(message, separators=(",", ":"))
+
+def encode_price_updates(updates: List[Dict[str, Any]], compact: bool, seq: int) -> str:
+    """
+    Serializes a batch of price updates. Fields that didn't change are omitted,
+    or null in the compact encoding, where each update is an array in `PRICE_UPDATE_FIELDS` order.
+    """
+    if compact:
+        return _encode({
+            "type": "price_updates",
+            "seq": seq,
+            "fields": PRICE_UPDATE_FIELDS,
+            "updates": [[update.get(field) for field in PRICE_UPDATE_FIELDS] for update in updates],
+        })
+    return _encode({"type": "price_updates", "seq": seq, "updates": updates})
+
+def merge_price_batches(batches: List[PriceBatch], compact: bool) -> str:
+    """
+    Encodes several batches as one frame, the latest value of each field winning.
+    """
+    merged: Dict[int, Dict[str, Any]] = {}
+    for _, batch in batches:
+        for update in batch:
+            merged.setdefault(update["trade_id"], {}).update(update)
+    return encode_price_updates(list(merged.values()), compact, batches[-1][0])
+
+class ClientConnection:
+    """
+    A connected dashboard with its own bounded buffer of outbound frames,
+    drained by a dedicated sender task.
+    """
+    __slots__ = ("websocket", "compact", "queue", "pending_prices", "pending_frame", "needs_snapshot", "overflows", "sender")
+
+    def __init__(self, websocket: WebSocket, buffer_size: int, compact: bool):
+        self.websocket = websocket
+        self.compact = compact
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=buffer_size)
+        # Price update batches not sent yet; merged into one frame when the sender gets to them
+        self.pending_prices: List[PriceBatch] = []
+        # The shared serialization of `pending_prices` while it holds a single batch
+        self.pending_frame: Optional[str] = None
+        # Set when buffered frames were dropped; the client is resynced with a snapshot
+        self.needs_snapshot = False
+        # Consecutive overflows without the client catching up
+        self.overflows = 0
+        self.sender: Optional[asyncio.Task] = None
+
+    def take_price_frame(self) -> Optional[str]:
+        """
+        Returns one frame with all pending price updates.
+        """
+        batches, self.pending_prices = self.pending_prices, []
+        frame, self.pending_frame = self.pending_frame, None
+        if frame is not None or not batches:
+            return frame
+        return merge_price_batches(batches, self.compact)
+
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: List[WebSocket] = []
+    """
+    Streams the active trade book to dashboards with a snapshot-plus-deltas protocol.
+
+    Every delta carries a sequence number. A connecting client receives a snapshot of
+    the book tagged with the current sequence number and the server's epoch (which
+    changes on restart), then the deltas that follow. A reconnecting client passes
+    `?since=<seq>&epoch=<epoch>` and is sent only the deltas it missed, replayed from a
+    ring buffer of recent deltas, or a fresh snapshot if they are no longer available.
+
+    A broadcast is serialized to JSON once and only appended to each client's buffer.
+    A client whose buffer is full has its backlog dropped and receives a snapshot
+    instead; a client that keeps falling behind, or whose socket stalls for longer than
+    `send_timeout`, is disconnected.
+
+    Price updates are sent as one batch per tick. A client still busy with an earlier
+    batch gets the batches conflated into a single frame, so a slow client receives
+    fewer, fresher frames instead of a growing backlog.
+    """
+    def __init__(
+        self,
+        snapshot: Callable[[], List[Dict[str, Any]]],
+        buffer_size: int,
+        send_timeout: float,
+        max_overflows: int,
+        compact_by_default: bool,
+        replay_size: int
+    ):
+        self.snapshot = snapshot
+        self.compact_by_default = compact_by_default
+        self.buffer_size = buffer_size
+        self.send_timeout = send_timeout
+        self.max_overflows = max_overflows
+        self.epoch = uuid.uuid4().hex[:12]
+        self.seq = 0
+        # Recent deltas as (seq, message) or, for price batches, (seq, updates)
+        self._history: Deque[Tuple[int, Any]] = deque(maxlen=replay_size)
+        self.active_connections: Dict[WebSocket, ClientConnection] = {}
+        # Closes of evicted clients still in progress
+        self._closing: Set[asyncio.Task] = set()
+
+    def _next_seq(self) -> int:
+        self.seq += 1
+        return self.seq
+
+    def _snapshot_frame(self) -> str:
+        return _encode({"type": "snapshot", "seq": self.seq, "epoch": self.epoch, "trades": self.snapshot()})
+
+    def _replay(self, since: int, compact: bool) -> Optional[List[str]]:
+        """
+        Encodes the deltas after `since`, merging consecutive price batches.
+        Returns None if some of them are no longer in the history.
+        """
+        if since > self.seq:
+            return None
+        missed = [entry for entry in self._history if entry[0] > since]
+        if len(missed) < self.seq - since:
+            return None
+        frames, prices = [], []
+        for seq, entry in missed:
+            if isinstance(entry, list):
+                prices.append((seq, entry))
+                continue
+            if prices:
+                frames.append(merge_price_batches(prices, compact))
+                prices = []
+            frames.append(_encode(entry))
+        if prices:
+            frames.append(merge_price_batches(prices, compact))
+        return frames
 
     async def connect(self, websocket: WebSocket):
         await websocket.accept()
-        self.active_connections.append(websocket)
+        params = websocket.query_params
+        # Clients may choose the price update encoding with ?encoding=compact|json
+        encoding = params.get("encoding")
+        compact = self.compact_by_default if encoding is None else encoding == "compact"
+        client = ClientConnection(websocket, self.buffer_size, compact)
+
+        # No awaits from here on, so no delta can slip in between the initial frames and registration
+        frames = None
+        since = params.get("since")
+        if since is not None and since.isdigit() and params.get("epoch") == self.epoch:
+            frames = self._replay(int(since), compact)
+        if frames is None or len(frames) >= self.buffer_size:
+            frames = [self._snapshot_frame()]
+        for frame in frames:
+            client.queue.put_nowait(frame)
+
+        client.sender = asyncio.create_task(self._run_sender(client))
+        self.active_connections[websocket] = client
 
     def disconnect(self, websocket: WebSocket):
-        self.active_connections.remove(websocket)
+        client = self.active_connections.pop(websocket, None)
+        if client is not None and client.sender is not None and client.sender is not asyncio.current_task():
+            client.sender.cancel()
+
+    async def _close(self, client: ClientConnection):
+        try:
+            # 1013: try again later
+            await asyncio.wait_for(client.websocket.close(code=1013), timeout=self.send_timeout)
+        except Exception:
+            pass
+
+    async def _evict(self, client: ClientConnection, reason: str):
+        print(f"Disconnecting websocket client: {reason}")
+        self.disconnect(client.websocket)
+        await self._close(client)
+
+    def _evict_soon(self, client: ClientConnection, reason: str):
+        """
+        Unregisters a client right away, so no further broadcast reaches it, and closes it in the background.
+        """
+        print(f"Disconnecting websocket client: {reason}")
+        self.disconnect(client.websocket)
+        task = asyncio.create_task(self._close(client))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def _run_sender(self, client: ClientConnection):
+        try:
+            while True:
+                frame = await client.queue.get()
+                if client.needs_snapshot:
+                    # The backlog was dropped, so resync first; the snapshot also
+                    # covers every delta skipped since and any pending price update
+                    client.needs_snapshot = False
+                    client.take_price_frame()
+                    frame = self._snapshot_frame()
+                elif frame is _PRICE_UPDATES:
+                    frame = client.take_price_frame()
+                    if frame is None:
+                        continue
+                await asyncio.wait_for(client.websocket.send_text(frame), timeout=self.send_timeout)
+                if client.queue.empty():
+                    client.overflows = 0
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            await self._evict(client, "send timed out")
+        except Exception as e:
+            # The socket is gone; the receive loop may not have noticed yet
+            await self._evict(client, f"send failed ({e})")
+
+    def _enqueue(self, client: ClientConnection, frame: Any):
+        if client.needs_snapshot:
+            # The pending snapshot supersedes this delta, and the sender is already woken up
+            return
+        try:
+            client.queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            client.overflows += 1
+            if client.overflows > self.max_overflows:
+                self._evict_soon(client, "too slow to keep up")
+                return
+            # Drop the backlog and let the sender resync the client with a snapshot
+            while not client.queue.empty():
+                client.queue.get_nowait()
+            client.pending_prices, client.pending_frame = [], None
+            client.needs_snapshot = True
+            client.queue.put_nowait(_RESYNC)
+
+    def broadcast(self, message: dict):
+        """
+        Sends a delta to every connected client. Never waits on socket I/O.
+        """
+        message = {**message, "seq": self._next_seq()}
+        self._history.append((message["seq"], message))
+        if not self.active_connections:
+            return
+        frame = _encode(message)
+        for client in list(self.active_connections.values()):
+            self._enqueue(client, frame)
+
+    def broadcast_prices(self, updates: List[Dict[str, Any]]):
+        """
+        Sends one tick's price updates to every connected client. Never waits on socket I/O.
+        """
+        if not updates:
+            return
+        seq = self._next_seq()
+        self._history.append((seq, updates))
+        # Serialized at most once per encoding
+        frames: Dict[bool, str] = {}
+        for client in list(self.active_connections.values()):
+            if client.needs_snapshot:
+                continue
+            if client.pending_prices:
+                # The previous batch hasn't been sent yet: conflate with it
+                client.pending_prices.append((seq, updates))
+                client.pending_frame = None
+                continue
+            if client.compact not in frames:
+                frames[client.compact] = encode_price_updates(updates, client.compact, seq)
+            client.pending_prices = [(seq, updates)]
+            client.pending_frame = frames[client.compact]
+            self._enqueue(client, _PRICE_UPDATES)
+
+def serialize_trade(trade: ActiveTrade) -> Dict[str, Any]:
+    """
+    The fields of an active trade shown on the dashboard.
+    """
+    return {
+        "trade_id": trade.id,
+        "symbol": trade.symbol,
+        "trade_type": getattr(trade.trade_type, "value", trade.trade_type),
+        "entry_price": trade.entry_price,
+        "current_price": trade.current_price,
+        "peak_price": trade.peak_price_today,
+    }
 
-    async def broadcast(self, message: dict):
-        for connection in self.active_connections:
-            await connection.send_json(message)
+def build_snapshot() -> List[Dict[str, Any]]:
+    """
+    All active trades, straight from the in-memory trade book.
+    """
+    return [serialize_trade(trade) for trade in trade_book.all()]
 
 # Create a single instance to be used throughout the application
-manager = ConnectionManager()
\ No newline at end of file
+manager = ConnectionManager(
+    build_snapshot,
+    buffer_size=settings.WEBSOCKET_SEND_BUFFER,
+    send_timeout=settings.WEBSOCKET_SEND_TIMEOUT,
+    max_overflows=settings.WEBSOCKET_MAX_OVERFLOWS,
+    compact_by_default=settings.WEBSOCKET_COMPACT_PRICE_UPDATES,
+    replay_size=settings.WEBSOCKET_REPLAY_BUFFER
+)
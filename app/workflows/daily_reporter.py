@@ -1,13 +1,15 @@
-import asyncio
 import base64
 from datetime import datetime, date
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import select
+from sqlalchemy.orm import undefer_group
 
 from .. import database
-from ..services.telegram_service import telegram_service
+from ..services.telegram_service import Priority
+from ..services.outbox import telegram_outbox
+from ..services.report_queries import closed_between
 from ..services.local_image_generator import image_generator
 from ..services.svg_templates import get_daily_report_html
+from ..services.assets import asset_registry
 from ..config import settings
 
 async def run_daily_report():
@@ -15,14 +17,13 @@ async def run_daily_report():
     Generates and sends a daily report for all trades closed today.
     """
     print("Running daily report...")
-    db = database.SessionLocal()
     try:
         today = date.today()
         # Query for trades where the 'closed_at' date is today
-        trades_closed_today = db.query(database.Trade).filter(
-            database.Trade.status == database.TradeStatus.CLOSED,
-            func.date(database.Trade.closed_at) == today
-        ).all()
+        async with database.AsyncSessionLocal() as db:
+            trades_closed_today = (await db.scalars(
+                select(database.Trade).options(undefer_group("images")).where(*closed_between(today, today))
+            )).all()
 
         if not trades_closed_today:
             print("No trades closed today. Daily report complete.")
@@ -35,28 +36,20 @@ async def run_daily_report():
             first_goal_price = trade.entry_price * (1 + settings.GOAL_1_PERCENT / 100)
             is_successful = trade.peak_price_today >= first_goal_price
 
-            # Decode hex strings from DB back to bytes, then encode to base64 for HTML
-            try:
-                entry_image_b64 = base64.b64encode(bytes.fromhex(trade.entry_image)).decode('utf-8')
-                peak_image_b64 = base64.b64encode(bytes.fromhex(trade.peak_image)).decode('utf-8')
-            except (ValueError, TypeError):
+            # Encode the stored image bytes to base64 for HTML
+            if not trade.entry_image or not trade.peak_image:
                 print(f"Skipping trade {trade.id} due to invalid image data.")
                 continue
-
-            # Read and encode the background image
-            try:
-                with open(settings.BACKGROUND_IMAGE_PATH, "rb") as image_file:
-                    background_image_b64 = base64.b64encode(image_file.read()).decode("utf-8")
-            except FileNotFoundError:
-                print(f"Background image not found at {settings.BACKGROUND_IMAGE_PATH}. Using empty background.")
-                background_image_b64 = ""
+            entry_image_b64 = base64.b64encode(trade.entry_image).decode('utf-8')
+            peak_image_b64 = base64.b64encode(trade.peak_image).decode('utf-8')
 
             # Generate the report HTML
             report_html = get_daily_report_html(
                 is_successful=is_successful,
                 entry_image_b64=entry_image_b64,
                 peak_image_b64=peak_image_b64,
-                background_image_b64=background_image_b64
+                # Served to the browser from memory by the asset registry
+                background_image_url=asset_registry.url_for("background.jpg")
             )
 
             # Render the HTML to a PNG
@@ -81,13 +74,14 @@ async def run_daily_report():
                     f"النسبة: {profit_percent:.1f}%"
                 )
                 
-                telegram_service.send_photo(photo_data=report_image, caption=caption)
-                print(f"Sent daily report for trade {trade.id}")
-            
-            # Avoid overwhelming the APIs
-            await asyncio.sleep(1)
+                delivered = await telegram_outbox.send_photo(
+                    photo_data=report_image,
+                    key=f"daily_report:{today.isoformat()}:{trade.id}",
+                    caption=caption,
+                    priority=Priority.REPORT
+                )
+                if delivered:
+                    print(f"Sent daily report for trade {trade.id}")
 
     except Exception as e:
         print(f"An error occurred during the daily report: {e}")
-    finally:
-        db.close()
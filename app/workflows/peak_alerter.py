@@ -1,15 +1,17 @@
 import asyncio
-import queue
-from sqlalchemy.orm import Session
+from sqlalchemy import update
 from datetime import datetime
 from typing import Tuple
 
 from .. import database
-from ..services.telegram_service import telegram_service
+from ..services.telegram_service import Priority
+from ..services.outbox import telegram_outbox
 from ..services.local_image_generator import image_generator
+from ..services.trade_book import trade_book, ActiveTrade
+from ..services.coalescing_queue import CoalescingQueue
 from ..config import settings
 
-def check_for_new_goal(trade: database.Trade) -> Tuple[int, str]:
+def check_for_new_goal(trade: ActiveTrade) -> Tuple[int, str]:
     """
     Checks if a new profit goal has been reached and returns the new goal level and a caption.
     """
@@ -44,71 +46,94 @@ def check_for_new_goal(trade: database.Trade) -> Tuple[int, str]:
     
     return new_goal, caption
 
-async def run_peak_alerter(db: Session, peak_queue: queue.Queue):
+async def save_peak_image(trade_id: int, image_bytes: bytes):
     """
-    Listens to a queue for trade IDs that have hit a new peak price,
-    then generates and sends the alert.
+    Stores the latest peak alert image of a trade.
     """
-    print("Starting peak alerter...")
-    while True:
-        try:
-            if not peak_queue.empty():
-                trade_id = peak_queue.get()
-                
-                # Use a new session to get the most up-to-date trade data
-                db_session = database.SessionLocal()
-                trade = db_session.query(database.Trade).filter(database.Trade.id == trade_id).first()
+    async with database.write_session() as db:
+        await db.execute(
+            update(database.Trade).where(database.Trade.id == trade_id).values(peak_image=image_bytes)
+        )
+
+async def process_peak(trade_id: int):
+    """
+    Generates and sends the alert for a trade that has hit a new peak price.
+    """
+    # The trade book always holds the most up-to-date trade data
+    trade = trade_book.get(trade_id)
 
-                if not trade:
-                    continue
+    if not trade:
+        return
 
-                # 1. Check for goal achievement
-                new_goal, caption = check_for_new_goal(trade)
-                should_update_goal = new_goal > trade.last_goal_achieved
-                
-                if should_update_goal:
-                    trade.last_goal_achieved = new_goal
+    # 1. Check for goal achievement
+    new_goal, caption = check_for_new_goal(trade)
+    should_update_goal = new_goal > trade.last_goal_achieved
 
-                # 2. Prepare data for image generation
-                price_change_value = trade.peak_price_today - trade.entry_price
-                price_change_percent = (price_change_value / trade.entry_price) * 100 if trade.entry_price != 0 else 0
+    # 2. Prepare data for image generation
+    price_change_value = trade.peak_price_today - trade.entry_price
+    price_change_percent = (price_change_value / trade.entry_price) * 100 if trade.entry_price != 0 else 0
 
-                image_data = {
-                    "underlying": trade.underlying,
-                    "strike_price": trade.strike,
-                    "expiration_date": trade.expiration_date,
-                    "type": trade.trade_type.value,
-                    "last_price": trade.peak_price_today,
-                    "mid_price": trade.current_price, # Show current mid, not peak
-                    "open_interest": 0, # Not available in quote, can be omitted
-                    "volume": 0, # Not available in quote, can be omitted
-                    "status": "Update",
-                    "time": datetime.now().strftime('%H:%M %d/%m'),
-                    "price_change_value": price_change_value,
-                    "price_change_percent": price_change_percent,
-                    "underlying_price": 0, # Not available in quote
-                    "underlying_change_value": 0,
-                    "underlying_change_percent": 0,
-                }
+    image_data = {
+        "underlying": trade.underlying,
+        "strike_price": trade.strike,
+        "expiration_date": trade.expiration_date,
+        "type": trade.trade_type.value,
+        "last_price": trade.peak_price_today,
+        "mid_price": trade.current_price, # Show current mid, not peak
+        "open_interest": 0, # Not available in quote, can be omitted
+        "volume": 0, # Not available in quote, can be omitted
+        "status": "Update",
+        "time": datetime.now().strftime('%H:%M %d/%m'),
+        "price_change_value": price_change_value,
+        "price_change_percent": price_change_percent,
+        "underlying_price": 0, # Not available in quote
+        "underlying_change_value": 0,
+        "underlying_change_percent": 0,
+    }
 
-                # 3. Generate the image
-                image_bytes = await image_generator.generate_trade_alert(image_data)
-                
-                if image_bytes:
-                    # 4. Save the peak image and new goal to the database
-                    trade.peak_image = image_bytes.hex()
-                    db_session.commit()
-                    
-                    # 5. Send the alert to Telegram
-                    telegram_service.send_photo(photo_data=image_bytes, caption=caption)
-                    print(f"Sent peak alert for trade {trade.id}")
-                
-                db_session.close()
-            
-            await asyncio.sleep(0.1) # Small delay to prevent busy-waiting
+    # 3. Generate the image
+    image_bytes = await image_generator.generate_trade_alert(image_data)
+    
+    if image_bytes:
+        # 4. Save the new goal (flushed right away by the book) and the peak image
+        if should_update_goal:
+            trade_book.set_goal(trade.id, new_goal)
+        await save_peak_image(trade.id, image_bytes)
+        
+        # 5. Queue the alert without waiting for delivery. The trade's ordering key makes
+        # the outbox deliver its alerts in the order they were queued, even across retries.
+        telegram_outbox.send_photo(
+            photo_data=image_bytes,
+            key=f"peak:{trade.id}:{image_data['last_price']:.2f}",
+            caption=caption,
+            priority=Priority.GOAL if should_update_goal else Priority.UPDATE,
+            ordering_key=f"trade:{trade.id}"
+        )
+        print(f"Queued peak alert for trade {trade.id}")
 
+async def run_alert_worker(worker_id: int, peak_queue: CoalescingQueue):
+    """
+    Takes trades off the peak queue and alerts on them one at a time.
+    The queue never hands the same trade to two workers at once, which keeps alerts of a trade in order.
+    """
+    while True:
+        trade_id, peak_price = await peak_queue.get()
+        try:
+            await process_peak(trade_id)
         except Exception as e:
-            print(f"Error in peak alerter loop: {e}")
-            if 'db_session' in locals():
-                db_session.rollback()
-                db_session.close()
\ No newline at end of file
+            print(f"Error in peak alert worker {worker_id} for trade {trade_id}: {e}")
+        finally:
+            await peak_queue.task_done(trade_id)
+
+async def run_peak_alerter(peak_queue: CoalescingQueue):
+    """
+    Listens to a queue for trade IDs that have hit a new peak price,
+    then generates and sends the alerts with a pool of concurrent workers.
+    Peaks of a trade that arrive while an alert is being rendered are merged into one
+    follow-up alert at the latest price.
+    """
+    print(f"Starting peak alerter with {settings.PEAK_ALERT_WORKERS} workers...")
+    await asyncio.gather(*(
+        run_alert_worker(worker_id, peak_queue)
+        for worker_id in range(max(1, settings.PEAK_ALERT_WORKERS))
+    ))
@@ -0,0 +1,157 @@
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Tuple
+from sqlalchemy import func, insert
+
+from .. import database
+from ..config import settings
+
+Resolution = database.BarResolution
+
+BAR_LENGTHS = {
+    Resolution.MINUTE: timedelta(minutes=1),
+    Resolution.HOUR: timedelta(hours=1),
+}
+
+def _floor(moment: datetime, resolution: Resolution) -> datetime:
+    """
+    Truncates a datetime to the start of its bar.
+    """
+    if resolution == Resolution.MINUTE:
+        return moment.replace(second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+def _rollup_window(db, resolution: Resolution, earliest_source: datetime, now: datetime) -> Tuple[datetime, datetime]:
+    """
+    Returns the half-open [start, end) range of complete bars that haven't been rolled up yet.
+    """
+    last_bar = db.query(func.max(database.PriceBar.start_at)).filter(
+        database.PriceBar.resolution == resolution
+    ).scalar()
+    start = last_bar + BAR_LENGTHS[resolution] if last_bar else _floor(earliest_source, resolution)
+    return start, _floor(now, resolution)
+
+def _merge_bars(rows: Iterable[Tuple[int, datetime, float, float, float, float, int]], resolution: Resolution) -> Dict:
+    """
+    Folds time-ordered (trade_id, time, open, high, low, close, count) rows into bars of the given resolution.
+    """
+    bars = {}
+    for trade_id, moment, open_, high, low, close, count in rows:
+        key = (trade_id, _floor(moment, resolution))
+        bar = bars.get(key)
+        if bar is None:
+            bars[key] = {
+                "trade_id": trade_id,
+                "resolution": resolution,
+                "start_at": key[1],
+                "open": open_,
+                "high": high,
+                "low": low,
+                "close": close,
+                "tick_count": count,
+            }
+        else:
+            bar["high"] = max(bar["high"], high)
+            bar["low"] = min(bar["low"], low)
+            bar["close"] = close
+            bar["tick_count"] += count
+    return bars
+
+def _rollup_minutes(db, now: datetime) -> int:
+    earliest = db.query(func.min(database.PriceTick.recorded_at)).scalar()
+    if earliest is None:
+        return 0
+    start, end = _rollup_window(db, Resolution.MINUTE, earliest, now)
+    if start >= end:
+        return 0
+
+    ticks = db.query(
+        database.PriceTick.trade_id, database.PriceTick.recorded_at, database.PriceTick.price
+    ).filter(
+        database.PriceTick.recorded_at >= start,
+        database.PriceTick.recorded_at < end
+    ).order_by(database.PriceTick.recorded_at, database.PriceTick.id).yield_per(5000)
+
+    bars = _merge_bars(
+        ((trade_id, recorded_at, price, price, price, price, 1) for trade_id, recorded_at, price in ticks),
+        Resolution.MINUTE
+    )
+    if bars:
+        db.execute(insert(database.PriceBar), list(bars.values()))
+    return len(bars)
+
+def _rollup_hours(db, now: datetime) -> int:
+    earliest = db.query(func.min(database.PriceBar.start_at)).filter(
+        database.PriceBar.resolution == Resolution.MINUTE
+    ).scalar()
+    if earliest is None:
+        return 0
+    start, end = _rollup_window(db, Resolution.HOUR, earliest, now)
+    if start >= end:
+        return 0
+
+    minute_bars = db.query(
+        database.PriceBar.trade_id,
+        database.PriceBar.start_at,
+        database.PriceBar.open,
+        database.PriceBar.high,
+        database.PriceBar.low,
+        database.PriceBar.close,
+        database.PriceBar.tick_count
+    ).filter(
+        database.PriceBar.resolution == Resolution.MINUTE,
+        database.PriceBar.start_at >= start,
+        database.PriceBar.start_at < end
+    ).order_by(database.PriceBar.start_at)
+
+    bars = _merge_bars(minute_bars, Resolution.HOUR)
+    if bars:
+        db.execute(insert(database.PriceBar), list(bars.values()))
+    return len(bars)
+
+def _apply_retention(db, now: datetime):
+    """
+    Deletes raw ticks and bars that are older than their retention period.
+    """
+    db.query(database.PriceTick).filter(
+        database.PriceTick.recorded_at < now - timedelta(hours=settings.PRICE_TICK_RETENTION_HOURS)
+    ).delete(synchronize_session=False)
+    for resolution, days in (
+        (Resolution.MINUTE, settings.PRICE_BAR_1M_RETENTION_DAYS),
+        (Resolution.HOUR, settings.PRICE_BAR_1H_RETENTION_DAYS),
+    ):
+        db.query(database.PriceBar).filter(
+            database.PriceBar.resolution == resolution,
+            database.PriceBar.start_at < now - timedelta(days=days)
+        ).delete(synchronize_session=False)
+
+def rollup_price_history():
+    """
+    Rolls complete minutes of raw ticks into 1-minute bars, complete hours of
+    1-minute bars into 1-hour bars, and applies the retention policies.
+    """
+    db = database.SessionLocal()
+    try:
+        now = datetime.utcnow()
+        # Ticks reach the database with the trade book's write-behind delay,
+        # so only bars that ended before that delay are considered complete
+        cutoff = now - timedelta(seconds=2 * settings.TRADE_BOOK_FLUSH_INTERVAL)
+        minute_bars = _rollup_minutes(db, cutoff)
+        hour_bars = _rollup_hours(db, cutoff)
+        _apply_retention(db, now)
+        db.commit()
+        if minute_bars or hour_bars:
+            print(f"Rolled up {minute_bars} minute bars and {hour_bars} hour bars.")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+async def run_price_rollups():
+    """
+    Scheduled job that maintains the downsampled price history.
+    """
+    try:
+        await database.run_write(rollup_price_history)
+    except Exception as e:
+        print(f"An error occurred during the price rollup: {e}")
@@ -1,100 +1,161 @@
 import asyncio
-import queue
 import random
-from sqlalchemy.orm import Session
+from collections import defaultdict
 from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
 
-from .. import database
 from ..services.marketdata_service import marketdata_service
-from ..services.telegram_service import telegram_service
+from ..services.trade_book import trade_book, ActiveTrade
+from ..services.poll_scheduler import poll_scheduler
+from ..services.trading_calendar import trading_calendar
+from ..services.coalescing_queue import CoalescingQueue
+from ..services.telegram_service import Priority
+from ..services.outbox import telegram_outbox
 from ..websocket import manager
 from ..config import settings
 
-async def fetch_and_process_quote(trade: database.Trade):
+async def fetch_quotes_for_group(underlying: str, expiration: str, trades: List[ActiveTrade]) -> Dict[int, Optional[Dict[str, Any]]]:
     """
-    Helper function to fetch a quote and apply randomization.
-    Runs the synchronous API call in a separate thread to avoid blocking.
+    Fetches quotes for all trades sharing an underlying and expiration with a single
+    chain request, then fans the rows back out to the trades by OCC symbol.
     """
-    params = {
-        "strike": trade.strike,
-        "side": trade.trade_type.value.lower(),
-        "expiration": trade.expiration_date.strftime('%Y-%m-%d')
-    }
-    
-    # Run the synchronous requests call in a thread pool
-    quote = await asyncio.to_thread(
-        marketdata_service.get_option_quote, trade.underlying, params
+    quotes = await marketdata_service.get_option_quotes_async(
+        underlying,
+        expiration,
+        [trade.strike for trade in trades],
+        [trade.trade_type.value for trade in trades]
     )
 
-    if quote and quote.get("mid"):
-        # --- FOR TESTING: Randomize the mid price ---
-        # original_mid = quote["mid"]
-        # randomized_mid = original_mid * random.uniform(0.7, 1.8) # +/- 2% change
-        # quote["mid"] = round(randomized_mid, 2)
-        # --- END TESTING CODE ---
-        return trade.id, quote
-    
-    return trade.id, None
-
-async def run_price_updater(peak_queue: queue.Queue):
+    results = {}
+    for trade in trades:
+        quote = quotes.get(trade.symbol)
+        if quote and quote.get("mid"):
+            # --- FOR TESTING: Randomize the mid price ---
+            # original_mid = quote["mid"]
+            # randomized_mid = original_mid * random.uniform(0.7, 1.8) # +/- 2% change
+            # quote["mid"] = round(randomized_mid, 2)
+            # --- END TESTING CODE ---
+            results[trade.id] = quote
+        else:
+            results[trade.id] = None
+    return results
+
+async def fetch_all_quotes(trades: List[ActiveTrade]) -> List[Tuple[int, Optional[Dict[str, Any]]]]:
+    """
+    Groups trades by underlying and expiration and fetches each option chain once.
+    """
+    groups = defaultdict(list)
+    for trade in trades:
+        groups[(trade.underlying, trade.expiration_date.strftime('%Y-%m-%d'))].append(trade)
+
+    # Create a list of concurrent tasks, one per chain
+    tasks = [
+        fetch_quotes_for_group(underlying, expiration, group_trades)
+        for (underlying, expiration), group_trades in groups.items()
+    ]
+    results = []
+    for group_results in await asyncio.gather(*tasks):
+        results.extend(group_results.items())
+    return results
+
+def close_expired_trade(trade: ActiveTrade, exit_price: float):
+    """
+    Closes a trade whose option has expired and removes it from the dashboards.
+    """
+    print(f"Trade {trade.symbol} has expired. Closing trade.")
+    trade_book.close(trade.id, exit_price=exit_price, reason="Expired")
+    manager.broadcast({
+        "type": "trade_closed",
+        "trade_id": trade.id
+    })
+
+def close_expired_trades():
     """
-    Continuously fetches price updates for all active trades concurrently.
+    Closes every expired trade at its last known price, without fetching quotes.
+    Expired contracts usually have no quote left, so they would otherwise stay open.
+    """
+    now = datetime.utcnow()
+    for trade in trade_book.all():
+        if trade.expiration_date < now:
+            close_expired_trade(trade, trade.current_price)
+
+async def run_price_updater(peak_queue: CoalescingQueue):
+    """
+    Continuously fetches price updates for the active trades that are due, concurrently.
+    The poll scheduler decides which chains are fetched on each tick; while the market
+    is closed the loop sleeps until the next session opens.
+    Reads and updates trades in the in-memory trade book; the book persists the changes.
     """
     print("Starting price updater...")
     while True:
-        db_session = None
         try:
-            db_session = database.SessionLocal()
-            active_trades = db_session.query(database.Trade).filter(database.Trade.status == database.TradeStatus.ACTIVE).all()
+            if not trading_calendar.is_open():
+                # Contracts expire at the close, so settle them before going idle
+                close_expired_trades()
+                session = trading_calendar.next_session()
+                opens_at = session.open.astimezone(trading_calendar.timezone)
+                print(f"Market closed. Price updater idle until {opens_at:%Y-%m-%d %H:%M %Z}.")
+                await trading_calendar.wait_until_open()
+                # Due times and volatility from the previous session don't carry over the gap
+                poll_scheduler.reset()
+                print("Market open. Price updater resumed.")
+                # Also catches trades that expired while the app was down
+                close_expired_trades()
+                continue
+
+            active_trades = trade_book.all()
             
             if not active_trades:
-                await asyncio.sleep(1)
+                await asyncio.sleep(settings.PRICE_UPDATE_INTERVAL)
+                continue
+
+            # Only the chains that are due and fit in the request budget
+            due_trades = poll_scheduler.select(active_trades)
+            if not due_trades:
+                await asyncio.sleep(settings.PRICE_UPDATE_INTERVAL)
                 continue
 
-            # Create a list of concurrent tasks
-            tasks = [fetch_and_process_quote(trade) for trade in active_trades]
-            results = await asyncio.gather(*tasks)
+            # Fetch one option chain per underlying/expiration instead of one request per trade
+            results = await fetch_all_quotes(due_trades)
+
+            # Price changes of this tick, sent to the dashboards as one batch
+            price_updates = []
 
             # Process results
             for trade_id, quote in results:
-                if quote:
-                    # Use get() for efficient lookup by primary key
-                    trade = db_session.get(database.Trade, trade_id)
-                    if not trade:
-                        continue
+                trade = trade_book.get(trade_id)
+                if not trade:
+                    # Closed while the quotes were in flight
+                    continue
+                # Schedule the next poll; a missing quote is retried soon
+                poll_scheduler.observe(trade, quote["mid"] if quote else None)
+
+                # --- BEGIN EXPIRATION CHECK ---
+                # Compare the full expiration datetime with the current datetime.
+                # Expired contracts often have no quote, so fall back to the last price.
+                if trade.expiration_date < datetime.utcnow():
+                    close_expired_trade(trade, quote["mid"] if quote else trade.current_price)
+                    # Skip further processing for this trade
+                    continue
+                # --- END EXPIRATION CHECK ---
 
+                if quote:
                     new_price = quote["mid"]
 
-                    # --- BEGIN EXPIRATION CHECK ---
-                    # Compare the full expiration datetime with the current datetime
-                    if trade.expiration_date < datetime.utcnow():
-                        # print(f"Trade {trade.symbol} has expired. Closing trade.")
-                        trade.status = database.TradeStatus.CLOSED
-                        trade.exit_price = new_price
-                        trade.closed_at = datetime.utcnow()
-                        trade.close_reason = "Expired"
-                                                
-                        await manager.broadcast({
-                            "type": "trade_closed",
-                            "trade_id": trade.id
-                        })
-                        
-                        # Skip further processing for this trade
-                        continue
-                    # --- END EXPIRATION CHECK ---
-                    
                     # --- BEGIN STOP LOSS CHECK ---
                     stop_loss_price = trade.entry_price * (1 - settings.STOP_LOSS_PERCENT / 100)
                     if new_price <= stop_loss_price:
                         print(f"Stop loss triggered for {trade.symbol} at {new_price}")
-                        trade.status = database.TradeStatus.CLOSED
-                        trade.exit_price = new_price
-                        trade.closed_at = datetime.utcnow()
-                        trade.close_reason = "Stop Loss"
+                        trade_book.close(trade.id, exit_price=new_price, reason="Stop Loss")
                         
-                        telegram_service.send_message(f"❌ضرب وقف الخسارة❌\n{trade.symbol}")
+                        # Queued at top priority; the price loop doesn't wait for delivery
+                        telegram_outbox.send_message(
+                            f"❌ضرب وقف الخسارة❌\n{trade.symbol}",
+                            key=f"stop_loss:{trade.id}",
+                            priority=Priority.STOP_LOSS
+                        )
                         
-                        await manager.broadcast({
+                        manager.broadcast({
                             "type": "trade_closed",
                             "trade_id": trade.id
                         })
@@ -105,31 +166,23 @@ async def run_price_updater(peak_queue: queue.Queue):
 
                     print(f"{trade.symbol}: {new_price}")
                     if new_price != trade.current_price:
-                        trade.current_price = new_price
                         is_new_peak = new_price >= trade.peak_price_today + 0.1
-                        
+                        trade_book.set_price(trade.id, new_price, peak_price=new_price if is_new_peak else None)
+
+                        # Only the fields that changed
+                        update = {"trade_id": trade.id, "current_price": new_price}
                         if is_new_peak:
-                            trade.peak_price_today = new_price
-                        
-                        await manager.broadcast({
-                            "type": "price_update",
-                            "trade_id": trade.id,
-                            "current_price": new_price,
-                            "peak_price": trade.peak_price_today
-                        })
+                            update["peak_price"] = new_price
+                        price_updates.append(update)
 
                         if is_new_peak:
                             print(f"New peak for {trade.symbol}: {new_price}")
-                            peak_queue.put(trade.id)
+                            # Waits only if the alerter is far behind; repeated peaks of a trade are merged
+                            await peak_queue.put(trade.id, new_price)
 
-            db_session.commit()
+            manager.broadcast_prices(price_updates)
 
         except Exception as e:
             print(f"Error in price updater loop: {e}")
-            if db_session:
-                db_session.rollback()
-        finally:
-            if db_session:
-                db_session.close()
         
-        await asyncio.sleep(1)
\ No newline at end of file
+        await asyncio.sleep(settings.PRICE_UPDATE_INTERVAL)
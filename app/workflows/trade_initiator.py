@@ -1,15 +1,25 @@
 import asyncio
 from datetime import datetime, timedelta
 from typing import Dict, Any
-from sqlalchemy.orm import Session
 
 from .. import database
 from ..services.marketdata_service import marketdata_service
-from ..services.telegram_service import telegram_service
+from ..services.telegram_service import Priority
+from ..services.outbox import telegram_outbox
 from ..services.local_image_generator import image_generator
+from ..services.trade_book import trade_book
+from ..websocket import manager, serialize_trade
 from ..config import settings
 
-async def initiate_trade(form_data: Dict[str, Any], db: Session):
+async def save_trade(new_trade: database.Trade):
+    """
+    Inserts a new trade and loads its generated id.
+    """
+    async with database.write_session() as db:
+        db.add(new_trade)
+        await db.flush()
+
+async def initiate_trade(form_data: Dict[str, Any]):
     """
     Orchestrates the entire process of initiating a new trade.
     """
@@ -41,7 +51,7 @@ async def initiate_trade(form_data: Dict[str, Any], db: Session):
 
     # 2. Find the option contract
     underlying_symbol = form_data.get("symbol").upper()
-    contract = marketdata_service.find_option_contract(underlying_symbol, api_params)
+    contract = await marketdata_service.find_option_contract_async(underlying_symbol, api_params)
 
     if not contract:
         error_message = f"Could not find an option contract for {underlying_symbol} with the specified criteria."
@@ -96,12 +106,13 @@ async def initiate_trade(form_data: Dict[str, Any], db: Session):
         peak_price_today=entry_price,
         expiration_date=datetime.utcfromtimestamp(contract["expiration_date"]),
         status=database.TradeStatus.ACTIVE,
-        entry_image=image_bytes.hex(), # Store image bytes as hex string
+        entry_image=image_bytes,
         last_goal_achieved=0
     )
-    db.add(new_trade)
-    db.commit()
-    db.refresh(new_trade)
+    await save_trade(new_trade)
+    record = trade_book.add(new_trade)
+    # Let open dashboards add the row
+    manager.broadcast({"type": "trade_opened", "trade": serialize_trade(record)})
     print(f"Successfully saved new trade {new_trade.id} to the database.")
 
     # 7. Send the alert to Telegram
@@ -122,7 +133,14 @@ async def initiate_trade(form_data: Dict[str, Any], db: Session):
         f"(الهدف الخامس: {goals['goal5']:.2f})\n"
         f"وقف الخسارة: {stop_loss_price:.2f}"
     )
-    telegram_service.send_photo(photo_data=image_bytes, caption=caption)
-    print("Sent trade alert to Telegram.")
+    # New entries are as urgent as goal alerts
+    telegram_outbox.send_photo(
+        photo_data=image_bytes,
+        key=f"entry:{new_trade.id}",
+        caption=caption,
+        priority=Priority.GOAL,
+        ordering_key=f"trade:{new_trade.id}"
+    )
+    print("Queued trade alert for Telegram.")
     
     return None # Return None on success
@@ -1,13 +1,11 @@
 import asyncio
-import base64
 from datetime import datetime, timedelta, date
-from sqlalchemy.orm import Session
-from sqlalchemy import func
 
-from .. import database
-from ..services.telegram_service import telegram_service
+from ..services.outbox import telegram_outbox
 from ..services.local_image_generator import image_generator
+from ..services.report_queries import load_period_report
 from ..services.report_templates import get_report_svg, wrap_svg_in_html
+from ..services.assets import asset_registry
 from ..config import settings
 
 async def run_weekly_report():
@@ -15,66 +13,25 @@ async def run_weekly_report():
     Generates and sends a weekly report for all trades closed in the last 7 days.
     """
     print("Running weekly report...")
-    db = database.SessionLocal()
     try:
         start_date = date.today() - timedelta(days=7)
-        trades_last_week = db.query(database.Trade).filter(
-            database.Trade.status == database.TradeStatus.CLOSED,
-            func.date(database.Trade.closed_at) >= start_date
-        ).all()
+        # 1. Aggregate the period in SQL and load the table rows
+        summary, trade_rows = await load_period_report(start_date)
 
-        if not trades_last_week:
+        if not summary["total_trades"]:
             print("No trades closed in the last 7 days. Weekly report complete.")
             return
 
-        # 1. Aggregate data and prepare trade rows
-        summary = {
-            "total_trades": len(trades_last_week),
-            "winning_trades": 0,
-            "losing_trades": 0,
-            "total_profit": 0.0,
-            "total_loss": 0.0,
-        }
-        trade_rows = []
-
-        for trade in trades_last_week:
-            profit = (trade.exit_price or 0) - trade.entry_price
-            is_winner = profit > 0
-            
-            if is_winner:
-                summary["winning_trades"] += 1
-                summary["total_profit"] += profit
-            else:
-                summary["losing_trades"] += 1
-                summary["total_loss"] += profit
-
-            trade_rows.append({
-                "symbol": trade.underlying,
-                "entryPrice": f"{trade.entry_price:.2f}",
-                "peakPrice": f"{trade.exit_price:.2f}",
-                "isWinner": is_winner,
-            })
-
         # 2. Prepare summary data for the template
-        summary["total_profit"] *= 100
-        summary["total_loss"] *= 100
-        
         today = datetime.now()
         to_date = today.strftime('%B %d')
         from_date = (today - timedelta(days=6)).strftime('%d')
 
-        try:
-            with open(settings.BACKGROUND_IMAGE_PATH, "rb") as image_file:
-                background_image_b64 = base64.b64encode(image_file.read()).decode("utf-8")
-        except FileNotFoundError:
-            print(f"Background image not found at {settings.BACKGROUND_IMAGE_PATH}. Using empty background.")
-            background_image_b64 = ""
-
         summary_data_for_template = {
             **summary,
             "date_range": f"{from_date} - {to_date}, {today.year}",
             "bot_name": settings.BOT_NAME,
-            "background_image_b64": background_image_b64
+            "background_image_url": asset_registry.url_for("background.jpg")
         }
 
         # 3. Generate the report SVG and render it
@@ -87,14 +44,14 @@ async def run_weekly_report():
         if report_pdf:
             today_str = datetime.now().strftime("%Y-%m-%d")
             file_name = f"weekly_report_{today_str}.pdf"
-            telegram_service.send_document(
+            delivered = await telegram_outbox.send_document(
                 document_data=report_pdf,
                 filename=file_name,
+                key=f"weekly_report:{today_str}",
                 caption="التقرير الاسبوعي"
             )
-            print("Sent weekly report to Telegram.")
+            if delivered:
+                print("Sent weekly report to Telegram.")
 
     except Exception as e:
-        print(f"An error occurred during the weekly report: {e}")
-    finally:
-        db.close()
\ No newline at end of file
+        print(f"An error occurred during the weekly report: {e}")
\ No newline at end of file
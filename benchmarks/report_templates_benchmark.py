@@ -0,0 +1,65 @@
+"""
+Micro-benchmark for building report and trade alert SVG strings.
+
+Run from the repository root:
+    python -m benchmarks.report_templates_benchmark
+"""
+import timeit
+from datetime import datetime
+
+from app.services.report_templates import get_report_svg
+from app.services.svg_templates import get_trade_alert_svg
+
+SUMMARY = {
+    "total_trades": 0,
+    "winning_trades": 0,
+    "losing_trades": 0,
+    "total_profit": 1234.5,
+    "total_loss": -321.0,
+    "date_range": "Year 2025",
+    "bot_name": "Option Bot",
+    "background_image_url": "http://assets.local/background.jpg",
+}
+
+ALERT = {
+    "underlying": "SPY",
+    "strike_price": 450.0,
+    "expiration_date": datetime(2025, 1, 17),
+    "type": "CALL",
+    "last_price": 3.45,
+    "mid_price": 3.40,
+    "open_interest": 12000,
+    "volume": 3400,
+    "status": "Update",
+    "time": "10:31 17/01",
+    "price_change_value": 0.85,
+    "price_change_percent": 32.7,
+    "underlying_price": 0,
+    "underlying_change_value": 0,
+    "underlying_change_percent": 0,
+}
+
+def make_rows(count: int) -> list:
+    return [
+        {
+            "symbol": f"T{i % 500}",
+            "entryPrice": f"{1 + i % 7:.2f}",
+            "peakPrice": f"{2 + i % 5:.2f}",
+            "isWinner": i % 3 != 0,
+        }
+        for i in range(count)
+    ]
+
+def main():
+    for count in (10, 1_000, 50_000):
+        rows = make_rows(count)
+        runs = max(1, 2_000 // count)
+        seconds = timeit.timeit(lambda: get_report_svg(SUMMARY, rows, "Report"), number=runs) / runs
+        print(f"get_report_svg      {count:>6} rows: {seconds * 1000:10.3f} ms")
+
+    runs = 10_000
+    seconds = timeit.timeit(lambda: get_trade_alert_svg(ALERT), number=runs) / runs
+    print(f"get_trade_alert_svg             : {seconds * 1_000_000:10.3f} us")
+
+if __name__ == "__main__":
+    main()
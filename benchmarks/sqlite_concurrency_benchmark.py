@@ -0,0 +1,128 @@
+"""
+Concurrency benchmark for the SQLite profile: dashboard reads of the active trades
+while the trade book flushes price updates and ticks once per second.
+
+Run from the repository root, once per profile:
+    python -m benchmarks.sqlite_concurrency_benchmark            # configured profile (WAL)
+    python -m benchmarks.sqlite_concurrency_benchmark --legacy   # rollback journal, no tuning
+
+With writes serialized through run_write, this workload shows no read latency
+difference between the profiles (8 s runs, 500 and 5,000 trades): the readers are
+bound by ORM loading under the GIL, not by the journal mode.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+parser = argparse.ArgumentParser()
+parser.add_argument("--legacy", action="store_true", help="Use SQLite's defaults instead of the configured profile")
+parser.add_argument("--trades", type=int, default=500)
+parser.add_argument("--readers", type=int, default=4)
+parser.add_argument("--seconds", type=float, default=15.0)
+ARGS = parser.parse_args()
+
+# Configure the app before its settings are imported
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+if ARGS.legacy:
+    os.environ.update({
+        "SQLITE_JOURNAL_MODE": "DELETE",
+        "SQLITE_SYNCHRONOUS": "FULL",
+        "SQLITE_MMAP_SIZE": "0",
+        "SQLITE_CACHE_SIZE": "-2000",
+        "SQLITE_BUSY_TIMEOUT_MS": "5000",
+    })
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import database  # noqa: E402
+from app.config import settings  # noqa: E402
+
+def seed():
+    db = database.SessionLocal()
+    try:
+        db.bulk_insert_mappings(database.Trade, [
+            {
+                "symbol": f"T{i}",
+                "underlying": f"T{i % 50}",
+                "trade_type": database.TradeType.CALL,
+                "entry_price": 1.0,
+                "current_price": 1.0,
+                "peak_price_today": 1.0,
+                "status": database.TradeStatus.ACTIVE,
+            }
+            for i in range(ARGS.trades)
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+def write_tick():
+    """
+    The same work as one trade book flush with every trade's price changed.
+    """
+    now = datetime.utcnow()
+    prices = {trade_id: round(random.uniform(0.5, 2.0), 2) for trade_id in range(1, ARGS.trades + 1)}
+    db = database.SessionLocal()
+    try:
+        db.bulk_update_mappings(database.Trade, [{"id": i, "current_price": p} for i, p in prices.items()])
+        db.execute(insert(database.PriceTick), [{"trade_id": i, "price": p, "recorded_at": now} for i, p in prices.items()])
+        db.commit()
+    finally:
+        db.close()
+
+def reader(stop: threading.Event, latencies: list, errors: list):
+    while not stop.is_set():
+        db = database.SessionLocal()
+        started = time.perf_counter()
+        try:
+            database.get_active_trades(db)
+            latencies.append(time.perf_counter() - started)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            db.close()
+
+async def writer(stop: threading.Event, durations: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await database.run_write(write_tick)
+        durations.append(time.perf_counter() - started)
+        await asyncio.sleep(max(0.0, 1.0 - (time.perf_counter() - started)))
+
+def percentile(values: list, fraction: float) -> float:
+    return sorted(values)[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+async def main():
+    database.init_db()
+    seed()
+    stop = threading.Event()
+    latencies, errors, write_durations = [], [], []
+    threads = [threading.Thread(target=reader, args=(stop, latencies, errors)) for _ in range(ARGS.readers)]
+    for thread in threads:
+        thread.start()
+    writer_task = asyncio.create_task(writer(stop, write_durations))
+    await asyncio.sleep(ARGS.seconds)
+    stop.set()
+    await writer_task
+    for thread in threads:
+        thread.join()
+
+    profile = "legacy" if ARGS.legacy else f"{settings.SQLITE_JOURNAL_MODE}/{settings.SQLITE_SYNCHRONOUS}"
+    print(f"profile {profile}: {ARGS.trades} trades, {ARGS.readers} readers, {ARGS.seconds:.0f}s")
+    print(f"  reads:  {len(latencies)} ok, {len(errors)} errors")
+    print(
+        f"  read latency ms: p50 {statistics.median(latencies) * 1000:.2f}, "
+        f"p99 {percentile(latencies, 0.99) * 1000:.2f}, max {max(latencies) * 1000:.2f}"
+    )
+    print(f"  write ms: p50 {statistics.median(write_durations) * 1000:.2f}, max {max(write_durations) * 1000:.2f}")
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
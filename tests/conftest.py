@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# The app reads its settings on import: point it at a scratch database and placeholder
+# credentials before any test module imports it
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+os.environ.setdefault("MARKETDATA_API_TOKEN", "test-token")
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "test-token")
+os.environ.setdefault("TELEGRAM_CHAT_ID", "0")
@@ -0,0 +1,91 @@
+"""
+Checks with SQLite's EXPLAIN QUERY PLAN that the report and active-trade queries
+search the trades indexes instead of scanning the table.
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.orm import undefer_group
+
+from app import database
+from app.services import report_queries
+
+@pytest.fixture(scope="module")
+def db():
+    database.init_db()
+    session = database.SessionLocal()
+    now = datetime.utcnow()
+    session.bulk_insert_mappings(database.Trade, [
+        {
+            "symbol": f"T{i}",
+            "underlying": f"T{i % 50}",
+            "trade_type": database.TradeType.CALL,
+            "entry_price": 1.0,
+            "exit_price": 1.0 + (i % 3 - 1) * 0.5,
+            "current_price": 1.0,
+            "peak_price_today": 1.5,
+            "status": database.TradeStatus.ACTIVE if i % 20 == 0 else database.TradeStatus.CLOSED,
+            "closed_at": None if i % 20 == 0 else now - timedelta(hours=i),
+        }
+        for i in range(2_000)
+    ])
+    session.commit()
+    session.execute(text("ANALYZE"))
+    try:
+        yield session
+    finally:
+        session.close()
+
+def query_plans(db, run) -> list:
+    """
+    Runs `run` and returns the query plan steps of every SELECT it sent to the driver.
+    """
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(database.engine, "before_cursor_execute", record)
+    try:
+        run()
+    finally:
+        event.remove(database.engine, "before_cursor_execute", record)
+    assert statements, "the query did not run"
+    return [
+        [row[-1] for row in db.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+        for statement, parameters in statements
+    ]
+
+def assert_uses_index(plans: list, *index_names: str):
+    """
+    Asserts every plan searches one of the indexes and doesn't scan a table.
+    """
+    for plan in plans:
+        assert any(
+            step.startswith("SEARCH") and any(name in step for name in index_names) for step in plan
+        ), plan
+        assert not any(step.startswith("SCAN") and "INDEX" not in step for step in plan), plan
+
+def test_active_trades_use_status_index(db):
+    plans = query_plans(db, lambda: database.get_active_trades(db))
+    # Both indexes lead with the status, so SQLite may pick either
+    assert_uses_index(plans, "ix_trades_status_underlying", "ix_trades_status_closed_at")
+
+def test_period_rows_use_closed_at_index(db):
+    today = date.today()
+    plans = query_plans(
+        db, lambda: db.execute(report_queries.trade_rows_query(today - timedelta(days=7), today)).all()
+    )
+    assert_uses_index(plans, "ix_trades_status_closed_at")
+
+def test_daily_report_uses_closed_at_index(db):
+    today = date.today()
+    plans = query_plans(
+        db,
+        lambda: db.query(database.Trade).options(undefer_group("images")).filter(
+            *report_queries.closed_between(today, today)
+        ).all()
+    )
+    assert_uses_index(plans, "ix_trades_status_closed_at")